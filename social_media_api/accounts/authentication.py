@@ -0,0 +1,154 @@
+# accounts/authentication.py
+"""
+Token authentication with cached token -> user id snapshots.
+
+DRF's TokenAuthentication joins Token and CustomUser on every request.
+CachedTokenAuthentication keeps a non-secret snapshot of the token's user
+(SNAPSHOT_FIELDS: id, username, is_active, is_staff) in the Django cache
+for AUTH_TOKEN_CACHE_TIMEOUT seconds, keyed by a hash of the token, never
+the token itself. A cache hit builds ``request.user`` from the snapshot
+without a query; any other field (never the password hash, which is not
+cached) is loaded from the primary on first access. It remembers which
+entry belongs to which user, so accounts/signals.py can drop it the moment
+the token is deleted (logout) or the user is saved (password change,
+deactivation, rename).
+
+Tokens and users are always read from the primary database: a replica
+lagging behind a logout or deactivation would otherwise be cached as valid.
+
+Invalidation only reaches other workers through a shared cache (CACHE_URL
+in settings). With a per-process cache the timeout defaults to 0, which
+turns the caching off and leaves plain TokenAuthentication behaviour.
+
+Bulk ``QuerySet.update()`` calls bypass those signals; call
+``invalidate_user`` after them.
+
+DRF views are synchronous; ``async_api_view`` gives plain Django async
+views (the ASGI read endpoints) the same token check and error format.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from social_media_api.db_routers import PRIMARY
+
+SNAPSHOT_FIELDS = ("id", "username", "is_active", "is_staff")
+
+
+def _timeout():
+    # read per call: 0 (no shared cache) disables caching
+    return getattr(settings, "AUTH_TOKEN_CACHE_TIMEOUT", 0)
+
+
+def _token_key(key):
+    return f"auth-token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _user_key(user_id):
+    return f"auth-token:user:{user_id}"
+
+
+def invalidate_token(key):
+    cache.delete(_token_key(key))
+
+
+def invalidate_user(user_id):
+    """Forget the cached snapshot of ``user_id``'s token, if any."""
+    token_key = cache.get(_user_key(user_id))
+    cache.delete_many([_user_key(user_id)] + ([token_key] if token_key else []))
+
+
+def _snapshot(key, user):
+    values = tuple(getattr(user, field) for field in SNAPSHOT_FIELDS)
+    return {_token_key(key): values, _user_key(user.pk): _token_key(key)}
+
+
+def _snapshot_user(values):
+    # as if loaded with .only(*SNAPSHOT_FIELDS): the other fields are deferred
+    model, snapshot = get_user_model(), dict(zip(SNAPSHOT_FIELDS, values))
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in snapshot]
+    return model.from_db(PRIMARY, names, [snapshot[name] for name in names])  # from_db wants model order
+
+
+def _check_active(user):
+    if user is None or not user.is_active:
+        raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        snapshot = cache.get(_token_key(key)) if _timeout() else None
+        if snapshot is None:
+            token = self.get_model().objects.using(PRIMARY).select_related("user").filter(key=key).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            user = _check_active(token.user)
+            if _timeout():
+                cache.set_many(_snapshot(key, user), _timeout())
+            return user, token
+
+        user = _check_active(_snapshot_user(snapshot))
+        # request.auth without a query; Token's primary key is the key itself
+        return user, self.get_model()(key=key, user_id=user.pk)
+
+
+async def aauthenticate(request):
+    """Async CachedTokenAuthentication: the user of the request's token, or None without one."""
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b"token":
+        return None
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed(_("Invalid token header."))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(_("Invalid token header."))
+
+    snapshot = await cache.aget(_token_key(key)) if _timeout() else None
+    if snapshot is not None:
+        return _check_active(_snapshot_user(snapshot))
+
+    token = await Token.objects.using(PRIMARY).select_related("user").filter(key=key).afirst()
+    if token is None:
+        raise exceptions.AuthenticationFailed(_("Invalid token."))
+    user = _check_active(token.user)
+    if _timeout():
+        await cache.aset_many(_snapshot(key, user), _timeout())
+    return user
+
+
+def async_api_view(auth_required=True):
+    """
+    Decorator for async views: token auth (401 like DRF), DRF errors as JSON,
+    and ``request.api`` — a DRF Request wrapper for paginators/serializers.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                request.user = await aauthenticate(request) or AnonymousUser()
+                if auth_required and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                request.api = Request(request)
+                request.api.user = request.user  # already authenticated, don't run the sync classes
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = JsonResponse(
+                    exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}, status=exc.status_code
+                )
+                if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    response["WWW-Authenticate"] = "Token"
+                return response
+        return wrapper
+    return decorator
@@ -0,0 +1,82 @@
+# accounts/follow_graph.py
+"""
+Cached follow-graph adjacency sets.
+
+``following`` is read on almost every authenticated request, so the ids a
+user follows (and the ids following them) are kept as frozensets in the
+Django cache. Lookups for many users are batched into one cache round trip
+and at most one query per direction; accounts/signals.py invalidates the
+affected users whenever the ``following`` M2M changes. Cache fills read the
+primary: a lagging replica would be cached for the whole timeout.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from social_media_api.db_routers import PRIMARY
+
+CACHE_TIMEOUT = getattr(settings, "FOLLOW_GRAPH_CACHE_TIMEOUT", 60 * 60)
+FOLLOWING = "following"
+FOLLOWERS = "followers"
+
+
+def _key(direction, user_id):
+    return f"follow-graph:{direction}:{user_id}"
+
+
+def _load(direction, user_ids):
+    """Read adjacency sets for ``user_ids`` from the through table in one query."""
+    through = get_user_model().following.through
+    follows = through.objects.using(PRIMARY)
+    if direction == FOLLOWING:
+        rows = follows.filter(from_customuser_id__in=user_ids).values_list(
+            "from_customuser_id", "to_customuser_id"
+        )
+    else:
+        rows = follows.filter(to_customuser_id__in=user_ids).values_list(
+            "to_customuser_id", "from_customuser_id"
+        )
+    result = {user_id: set() for user_id in user_ids}
+    for user_id, other_id in rows:
+        result[user_id].add(other_id)
+    return {user_id: frozenset(ids) for user_id, ids in result.items()}
+
+
+def _get_many(direction, user_ids):
+    user_ids = list(dict.fromkeys(user_ids))
+    keys = {_key(direction, user_id): user_id for user_id in user_ids}
+    cached = cache.get_many(keys.keys())
+    result = {keys[key]: value for key, value in cached.items()}
+    missing = [user_id for user_id in user_ids if user_id not in result]
+    if missing:
+        loaded = _load(direction, missing)
+        cache.set_many({_key(direction, user_id): ids for user_id, ids in loaded.items()}, CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def following_ids_many(user_ids):
+    """{user_id: frozenset of ids that user follows}"""
+    return _get_many(FOLLOWING, user_ids)
+
+
+def follower_ids_many(user_ids):
+    """{user_id: frozenset of ids following that user}"""
+    return _get_many(FOLLOWERS, user_ids)
+
+
+def following_ids(user_id):
+    return following_ids_many([user_id])[user_id]
+
+
+def follower_ids(user_id):
+    return follower_ids_many([user_id])[user_id]
+
+
+def is_following(user_id, other_id):
+    return other_id in following_ids(user_id)
+
+
+def invalidate(user_ids):
+    """Forget both adjacency sets of every user in ``user_ids``."""
+    cache.delete_many([_key(direction, user_id) for user_id in user_ids for direction in (FOLLOWING, FOLLOWERS)])
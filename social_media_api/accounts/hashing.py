@@ -0,0 +1,131 @@
+# accounts/hashing.py
+"""
+Bounded password-hashing service for login and registration.
+
+PBKDF2 costs hundreds of milliseconds of CPU per call, so a burst of
+logins can occupy every request worker. Hashing is funnelled through one
+small thread pool instead:
+
+* at most PASSWORD_HASHING_WORKERS hashes run at once;
+* at most PASSWORD_HASHING_MAX_PENDING calls may be running or queued;
+  beyond that, callers get ``HashingOverloaded`` (503 + Retry-After)
+  straight away instead of waiting in line;
+* sync views block on the result, async views (ASGI) await it without
+  tying up the event loop.
+
+Only the hashing runs in the pool; user lookups and saves stay on the
+caller's thread and database connection. ``authenticate`` mirrors
+ModelBackend (timing padding for unknown users, is_active, hash upgrades)
+for the username/password login used by this project; it does not walk
+AUTHENTICATION_BACKENDS (the project only uses ModelBackend). Like
+``django.contrib.auth.authenticate`` + ``login`` it sends
+``user_login_failed`` / ``user_logged_in`` (which updates last_login), on
+the sync and async login paths alike.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in, user_login_failed
+from django.contrib.auth.hashers import make_password, verify_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+WORKERS = getattr(settings, "PASSWORD_HASHING_WORKERS", 4)
+MAX_PENDING = getattr(settings, "PASSWORD_HASHING_MAX_PENDING", 32)
+RETRY_AFTER = getattr(settings, "PASSWORD_HASHING_RETRY_AFTER", 1)
+
+
+class HashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-in requests right now, please retry shortly."
+    default_code = "hashing_overloaded"
+
+    def __init__(self, wait=RETRY_AFTER):
+        super().__init__()
+        self.wait = wait  # DRF's exception handler turns this into Retry-After
+
+
+class HashingPool:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, func, *args):
+        """Start ``func(*args)`` in the pool, or raise HashingOverloaded if it is full."""
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloaded()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+
+pool = HashingPool()
+
+
+def hash_password(password):
+    return pool.run(make_password, password)
+
+
+async def ahash_password(password):
+    return await pool.arun(make_password, password)
+
+
+def _get_user(username):
+    User = get_user_model()
+    try:
+        return User._default_manager.get_by_natural_key(username)
+    except User.DoesNotExist:
+        return None
+
+
+def _active_user(user, is_correct):
+    if not is_correct or user is None or not getattr(user, "is_active", True):
+        return None
+    return user
+
+
+def authenticate(username, password, request=None):
+    """The active user matching the credentials, or None."""
+    user = _get_user(username)
+    # a missing user still pays for one hash (verify_password pads the runtime)
+    is_correct, must_update = pool.run(verify_password, password, user.password if user else None)
+    if is_correct and must_update:
+        user.password = hash_password(password)
+        user.save(update_fields=["password"])
+    user = _active_user(user, is_correct)
+    if user is None:
+        user_login_failed.send(sender=__name__, credentials={"username": username}, request=request)
+    else:
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
+    return user
+
+
+async def aauthenticate(username, password, request=None):
+    User = get_user_model()
+    try:
+        user = await User._default_manager.aget_by_natural_key(username)
+    except User.DoesNotExist:
+        user = None
+    is_correct, must_update = await pool.arun(verify_password, password, user.password if user else None)
+    if is_correct and must_update:
+        user.password = await ahash_password(password)
+        await user.asave(update_fields=["password"])
+    user = _active_user(user, is_correct)
+    if user is None:
+        await user_login_failed.asend(sender=__name__, credentials={"username": username}, request=request)
+    else:
+        await user_logged_in.asend(sender=user.__class__, request=request, user=user)
+    return user
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the "who to follow" candidates of every user from the two-hop follow graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=suggestions.LIMIT, help='Candidates kept per user')
+        parser.add_argument(
+            '--batch-pairs', type=int, default=suggestions.BATCH_PAIRS,
+            help='Two-hop paths expanded per batch (bounds memory)',
+        )
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{stats.users} users, {stats.suggestions} suggestions ({stats.elapsed:.1f}s)')
+
+        stats = suggestions.rebuild(limit=options['limit'], max_pairs=options['batch_pairs'], on_batch=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt suggestions for {stats.users} users ({stats.suggestions} rows) '
+            f'in {stats.batches} batches, {stats.elapsed:.1f}s.'
+        ))
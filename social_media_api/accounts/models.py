@@ -5,6 +5,7 @@ from django.db import models
 class CustomUser(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to="profile_pics/", blank=True, null=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)  # filled by posts/images.py
     followers = models.ManyToManyField(
         "self",
         symmetrical=False,
@@ -20,3 +21,19 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class FollowSuggestion(models.Model):
+    """Precomputed "who to follow" row: ``score`` accounts ``user`` follows also follow ``candidate``."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="follow_suggestions")
+    candidate = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("user", "candidate")
+        indexes = [
+            models.Index(fields=["user", "-score", "candidate"], name="suggestion_user_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.candidate_id} for {self.user_id} ({self.score})"
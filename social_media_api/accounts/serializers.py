@@ -1,7 +1,10 @@
-from django.contrib.auth import authenticate
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
-from .models import get_user_model
+from posts.fieldsets import SparseFieldsSerializerMixin
+from posts.serializers import ImageVariantField
+from . import hashing
+from .models import FollowSuggestion
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -12,13 +15,16 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "email", "password", "bio", "profile_picture"]
 
     def create(self, validated_data):
-        user = get_user_model().objects.create_user(
-            username=validated_data["username"],
-            email=validated_data["email"],
-            password=validated_data["password"],
+        User = get_user_model()
+        user = User(
+            username=User.normalize_username(validated_data["username"]),
+            email=User.objects.normalize_email(validated_data.get("email", "")),
             bio=validated_data.get("bio", ""),
             profile_picture=validated_data.get("profile_picture", None),
         )
+        # async views hash beforehand and pass save(password_hash=...)
+        user.password = validated_data.get("password_hash") or hashing.hash_password(validated_data["password"])
+        user.save()
         Token.objects.create(user=user)
         return user
 
@@ -28,7 +34,8 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField(write_only=True)
 
     def validate(self, data):
-        user = authenticate(username=data["username"], password=data["password"])
+        # PBKDF2 runs in the bounded hashing pool (503 when it is saturated)
+        user = hashing.authenticate(data["username"], data["password"], self.context.get("request"))
         if not user:
             raise serializers.ValidationError("Invalid username or password.")
         data["user"] = user
@@ -36,7 +43,30 @@ class LoginSerializer(serializers.Serializer):
 
 
 class ProfileSerializer(serializers.ModelSerializer):
+    profile_picture_thumbnail = ImageVariantField("profile_picture", "thumbnail")
+    profile_picture_medium = ImageVariantField("profile_picture", "medium")
+
     class Meta:
         model = get_user_model()
-        fields = ["id", "username", "email", "bio", "profile_picture", "followers", "following"]
+        fields = [
+            "id", "username", "email", "bio", "profile_picture",
+            "profile_picture_thumbnail", "profile_picture_medium", "followers", "following",
+        ]
         read_only_fields = ["followers", "following"]
+
+
+class UserSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    profile_picture_thumbnail = ImageVariantField("profile_picture", "thumbnail")
+
+    class Meta:
+        model = get_user_model()
+        fields = ["id", "username", "bio", "profile_picture", "profile_picture_thumbnail"]
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    user = UserSerializer(source="candidate", read_only=True)
+    mutual_follows = serializers.IntegerField(source="score", read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ["user", "mutual_follows"]
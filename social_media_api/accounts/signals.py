@@ -0,0 +1,38 @@
+# accounts/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from posts import images
+from . import authentication, follow_graph
+from .models import CustomUser
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def invalidate_follow_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # clear() gives no pk_set; remember the other side before the rows go away
+        other = follow_graph.follower_ids(instance.pk) if reverse else follow_graph.following_ids(instance.pk)
+        instance._follow_graph_cleared = set(other)
+    elif action == "post_clear":
+        follow_graph.invalidate({instance.pk} | getattr(instance, "_follow_graph_cleared", set()))
+    elif action in ("post_add", "post_remove"):
+        follow_graph.invalidate({instance.pk} | set(pk_set or ()))
+
+
+@receiver(post_save, sender=CustomUser)
+def render_profile_picture_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule(instance, "profile_picture")
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_cached_auth_user(sender, instance, **kwargs):
+    # password changes, deactivation and profile edits must not be served stale
+    authentication.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_auth_token(sender, instance, **kwargs):
+    # logout (LogoutView deletes the token) and admin revocations
+    authentication.invalidate_token(instance.key)
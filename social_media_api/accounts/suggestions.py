@@ -0,0 +1,151 @@
+# accounts/suggestions.py
+"""
+"Who to follow" candidates (``manage.py rebuild_follow_suggestions``).
+
+A candidate for ``user`` is anyone followed by the accounts ``user``
+follows; its score is how many of them follow it (mutual follows over two
+hops). Users already followed, the user themselves and inactive accounts
+are left out.
+
+The ``following`` through table is read once into numpy arrays sorted by
+follower (a CSR adjacency list) and the two hops are expanded with array
+operations only: range gathers, ``np.unique`` to count (user, candidate)
+pairs and ``np.isin`` to drop the followed ones. Users are processed in
+batches of about FOLLOW_SUGGESTIONS_BATCH_PAIRS two-hop paths, which bounds
+memory however the follower counts are spread.
+
+The best FOLLOW_SUGGESTIONS_LIMIT candidates of each user replace their
+FollowSuggestion rows in one short transaction per batch; the endpoint
+keeps serving the previous rows meanwhile and reads a user's list with one
+(user, -score) index range scan.
+"""
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import CustomUser, FollowSuggestion
+
+LIMIT = getattr(settings, "FOLLOW_SUGGESTIONS_LIMIT", 20)
+BATCH_PAIRS = getattr(settings, "FOLLOW_SUGGESTIONS_BATCH_PAIRS", 2_000_000)
+WRITE_CHUNK = 1000
+
+
+@dataclass
+class RebuildStats:
+    users: int = 0
+    suggestions: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def _ranges(starts, lengths):
+    """Indices of the concatenated ranges ``starts[i]:starts[i] + lengths[i]``."""
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+
+
+class FollowGraph:
+    """Follow edges as sorted arrays: ``targets[sources == u]`` are the ids ``u`` follows."""
+
+    def __init__(self, sources, targets, excluded=()):
+        order = np.argsort(sources, kind="stable")
+        self.sources = np.asarray(sources, dtype=np.int64)[order]
+        self.targets = np.asarray(targets, dtype=np.int64)[order]
+        self.excluded = np.asarray(excluded, dtype=np.int64)
+        # (user, candidate) pairs are packed into one int64: user * width + candidate
+        self.width = int(max(self.sources.max(initial=0), self.targets.max(initial=0))) + 1
+        self.users, self.first_edge, self.degrees = np.unique(
+            self.sources, return_index=True, return_counts=True
+        )
+
+    @classmethod
+    def load(cls):
+        """The current graph, from one query on the through table (plus one for inactive users)."""
+        rows = CustomUser.following.through.objects.values_list("from_customuser_id", "to_customuser_id")
+        edges = np.array(list(rows.iterator(chunk_size=10000)), dtype=np.int64).reshape(-1, 2)
+        inactive = CustomUser.objects.filter(is_active=False).values_list("id", flat=True)
+        return cls(edges[:, 0], edges[:, 1], excluded=list(inactive))
+
+    def _out_degree(self, user_ids):
+        index = np.searchsorted(self.users, user_ids).clip(max=len(self.users) - 1)
+        return np.where(self.users[index] == user_ids, self.degrees[index], 0)
+
+    def _edges_from(self, user_ids):
+        """(position in ``user_ids``, followed id) of every edge leaving ``user_ids``."""
+        starts = np.searchsorted(self.sources, user_ids, side="left")
+        lengths = np.searchsorted(self.sources, user_ids, side="right") - starts
+        return np.repeat(np.arange(len(user_ids)), lengths), self.targets[_ranges(starts, lengths)]
+
+    def batches(self, max_pairs=BATCH_PAIRS):
+        """Arrays of user ids (everyone following someone), about ``max_pairs`` two-hop paths each."""
+        if not len(self.users):
+            return
+        paths = np.add.reduceat(self._out_degree(self.targets), self.first_edge)
+        bucket = (np.cumsum(paths) - paths) // max(max_pairs, 1)
+        yield from np.split(self.users, np.flatnonzero(np.diff(bucket)) + 1)
+
+    def candidates(self, user_ids, limit=LIMIT):
+        """(user, candidate, score) arrays holding the top ``limit`` candidates of each of ``user_ids``."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        first, followed = self._edges_from(user_ids)
+        owners = user_ids[first]
+        second, candidates = self._edges_from(followed)
+        owners2 = owners[second]
+
+        keys = owners2 * self.width + candidates
+        keep = (candidates != owners2) & ~np.isin(keys, owners * self.width + followed)
+        if len(self.excluded):
+            keep &= ~np.isin(candidates, self.excluded)
+        # each (user, followed, candidate) path is distinct, so the count is the mutual-follow count
+        pairs, scores = np.unique(keys[keep], return_counts=True)
+        users, candidates = np.divmod(pairs, self.width)
+
+        order = np.lexsort((candidates, -scores, users))
+        users, candidates, scores = users[order], candidates[order], scores[order]
+        position = np.arange(len(users))
+        group_start = np.maximum.accumulate(np.where(np.r_[True, users[1:] != users[:-1]], position, 0))
+        top = position - group_start < limit
+        return users[top], candidates[top], scores[top]
+
+
+def _replace(user_ids, users, candidates, scores):
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=user_ids.tolist()).delete()
+        FollowSuggestion.objects.bulk_create([
+            FollowSuggestion(user_id=user, candidate_id=candidate, score=score)
+            for user, candidate, score in zip(users.tolist(), candidates.tolist(), scores.tolist())
+        ], batch_size=WRITE_CHUNK)
+
+
+def rebuild(limit=LIMIT, max_pairs=BATCH_PAIRS, on_batch=None):
+    """Recompute every user's suggestions; returns RebuildStats. ``on_batch(stats)`` runs per batch."""
+    stats = RebuildStats()
+    graph = FollowGraph.load()
+    for user_ids in graph.batches(max_pairs):
+        users, candidates, scores = graph.candidates(user_ids, limit)
+        for start in range(0, len(user_ids), WRITE_CHUNK):  # keeps the IN lists short
+            chunk = user_ids[start:start + WRITE_CHUNK]
+            # users come back sorted: the chunk's rows are one contiguous slice
+            rows = slice(np.searchsorted(users, chunk[0], "left"), np.searchsorted(users, chunk[-1], "right"))
+            _replace(chunk, users[rows], candidates[rows], scores[rows])
+        stats.users += len(user_ids)
+        stats.suggestions += len(users)
+        stats.batches += 1
+        if on_batch is not None:
+            on_batch(stats)
+
+    # users who stopped following anyone keep no suggestions
+    stale = np.setdiff1d(
+        np.fromiter(FollowSuggestion.objects.values_list("user_id", flat=True).distinct(), dtype=np.int64),
+        graph.users,
+    )
+    for start in range(0, len(stale), WRITE_CHUNK):
+        FollowSuggestion.objects.filter(user_id__in=stale[start:start + WRITE_CHUNK].tolist()).delete()
+    return stats
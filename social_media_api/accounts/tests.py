@@ -1,3 +1,255 @@
-from django.test import TestCase
+import json
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from posts.benchmark import EndpointBudgetMixin
+from . import authentication, follow_graph, hashing, suggestions
+from .models import CustomUser, FollowSuggestion
+from .views import login_async
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="password123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="password123")
+        self.carol = CustomUser.objects.create_user(username="carol", password="password123")
+        self.alice.following.add(self.bob, self.carol)
+
+    def test_reads_are_cached(self):
+        self.assertEqual(follow_graph.following_ids(self.alice.pk), {self.bob.pk, self.carol.pk})
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.alice.pk, self.bob.pk))
+
+    def test_batched_lookup_uses_one_query(self):
+        with self.assertNumQueries(1):
+            followers = follow_graph.follower_ids_many([self.alice.pk, self.bob.pk, self.carol.pk])
+        self.assertEqual(followers, {
+            self.alice.pk: frozenset(),
+            self.bob.pk: {self.alice.pk},
+            self.carol.pk: {self.alice.pk},
+        })
+
+    def test_m2m_changes_invalidate_both_sides(self):
+        follow_graph.follower_ids(self.bob.pk)
+        self.alice.following.remove(self.bob)
+        self.assertEqual(follow_graph.following_ids(self.alice.pk), {self.carol.pk})
+        self.assertEqual(follow_graph.follower_ids(self.bob.pk), frozenset())
+
+        self.carol.user_following.add(self.bob)  # reverse side: bob follows carol
+        self.assertEqual(follow_graph.follower_ids(self.carol.pk), {self.alice.pk, self.bob.pk})
+
+        self.alice.following.clear()
+        self.assertEqual(follow_graph.follower_ids(self.carol.pk), {self.bob.pk})
+
+    def test_follow_endpoints_ignore_a_stale_cache(self):
+        # another worker's view of the graph: the local cache disagrees with the database
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        cache.set(follow_graph._key(follow_graph.FOLLOWING, self.alice.pk), frozenset())
+        client.post(reverse("unfollow_user", args=[self.bob.pk]))
+        self.assertFalse(self.alice.following.filter(pk=self.bob.pk).exists())
+
+        cache.set(follow_graph._key(follow_graph.FOLLOWING, self.alice.pk), frozenset({self.bob.pk}))
+        client.post(reverse("follow_user", args=[self.bob.pk]))
+        self.assertTrue(self.alice.following.filter(pk=self.bob.pk).exists())
+
+
+class FollowEndpointBudgetTests(EndpointBudgetMixin, APITestCase):
+    """Query-count / latency budgets for follow and unfollow."""
+
+    def test_follow_and_unfollow(self):
+        viewer = self.graph["viewer"]
+        target_id = next(
+            user_id for user_id in reversed(self.graph["user_ids"])
+            if not viewer.following.filter(pk=user_id).exists()
+        )
+        follow_url = reverse("follow_user", args=[target_id])
+        unfollow_url = reverse("unfollow_user", args=[target_id])
+
+        def follow():
+            self.assertEqual(self.client.post(follow_url).status_code, status.HTTP_200_OK)
+
+        def unfollow():
+            self.assertEqual(self.client.post(unfollow_url).status_code, status.HTTP_200_OK)
+
+        self.assertWithinBudget("follow", follow, setup=lambda: self.client.post(unfollow_url))
+        self.assertWithinBudget("unfollow", unfollow, setup=lambda: self.client.post(follow_url))
+
+
+@override_settings(AUTH_TOKEN_CACHE_TIMEOUT=300)  # as with a shared cache
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="alice", password="password123")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("notifications-unread-count")
+
+    def test_second_request_skips_the_token_and_user_lookups(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        auth_queries = [query for query in queries if "authtoken_token" in query["sql"] or "customuser" in query["sql"]]
+        self.assertFalse(auth_queries)
+        # a snapshot of non-secret fields is cached, never the user (and its password hash)
+        snapshot = cache.get(authentication._token_key(self.token.key))
+        self.assertEqual(snapshot, (self.user.pk, "alice", True, False))
+
+    def test_snapshot_user_defers_the_other_fields(self):
+        self.client.get(self.url)
+        user, _ = authentication.CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            self.assertEqual([user.pk, user.username, user.is_staff], [self.user.pk, "alice", False])
+        with self.assertNumQueries(1):
+            self.assertEqual(user.password, self.user.password)
+
+    def test_async_hit_builds_the_user_without_queries(self):
+        request = RequestFactory().get(self.url, HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertEqual(async_to_sync(authentication.aauthenticate)(request), self.user)  # fills the cache
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(authentication.aauthenticate)(request).username, "alice")
+
+    def test_rename_invalidates(self):
+        self.client.get(self.url)
+        self.user.username = "alicia"
+        self.user.save()
+        self.assertIsNone(cache.get(authentication._token_key(self.token.key)))
+
+    @override_settings(AUTH_TOKEN_CACHE_TIMEOUT=0)
+    def test_no_caching_without_a_shared_cache(self):
+        self.client.get(self.url)
+        self.assertIsNone(cache.get(authentication._token_key(self.token.key)))
+
+    def test_logout_revokes_immediately(self):
+        self.client.get(self.url)
+        self.assertEqual(self.client.post(reverse("logout")).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_and_password_change_invalidate(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+        self.client.get(self.url)
+        self.user.set_password("changed123")
+        self.user.save()
+        self.assertNotIn(authentication._user_key(self.user.pk), cache)
+
+
+class PasswordHashingTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="alice", password="password123")
+
+    def _saturated_pool(self):
+        pool = hashing.HashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        pool.submit(release.wait)
+        self.addCleanup(release.set)
+        return pool
+
+    def test_full_pool_rejects_immediately(self):
+        pool = self._saturated_pool()
+        with self.assertRaises(hashing.HashingOverloaded):
+            pool.submit(hashing.make_password, "password123")
+
+    def test_login_sheds_load_with_503(self):
+        with mock.patch.object(hashing, "pool", self._saturated_pool()):
+            response = self.client.post(reverse("login"), {"username": "alice", "password": "password123"})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_sync_login_and_register(self):
+        response = self.client.post(reverse("login"), {"username": "alice", "password": "password123"})
+        self.assertEqual(response.data["user_id"], self.user.pk)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)  # user_logged_in was sent
+        failed = mock.Mock()
+        user_login_failed.connect(failed)
+        self.addCleanup(user_login_failed.disconnect, failed)
+        response = self.client.post(reverse("login"), {"username": "alice", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(failed.call_args.kwargs["credentials"], {"username": "alice"})
+        response = self.client.post(
+            reverse("register"), {"username": "bob", "email": "bob@example.com", "password": "password123"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(CustomUser.objects.get(username="bob").check_password("password123"))
+
+    async def test_async_login(self):
+        factory = AsyncRequestFactory()
+        request = factory.post("/", {"username": "alice", "password": "password123"}, content_type="application/json")
+        response = await login_async(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["user_id"], self.user.pk)
+        await self.user.arefresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+
+class FollowSuggestionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        names = ["alice", "bob", "carol", "dave", "eve"]
+        self.users = {name: CustomUser.objects.create_user(username=name, password="password123") for name in names}
+        alice, bob, carol, dave, eve = self.users.values()
+        alice.following.add(bob, carol)
+        bob.following.add(carol, dave, eve)
+        carol.following.add(dave)
+        dave.following.add(alice)
+
+    def suggested(self, name):
+        rows = FollowSuggestion.objects.filter(user=self.users[name]).order_by("-score", "candidate")
+        return [(row.candidate.username, row.score) for row in rows]
+
+    def test_rebuild_scores_mutual_follows(self):
+        stats = suggestions.rebuild()
+        self.assertEqual(stats.users, 4)
+        self.assertEqual(self.suggested("alice"), [("dave", 2), ("eve", 1)])  # carol is already followed
+        self.assertEqual(self.suggested("bob"), [("alice", 1)])
+        self.assertEqual(self.suggested("dave"), [("bob", 1), ("carol", 1)])
+        self.assertEqual(self.suggested("eve"), [])
+
+        self.users["carol"].following.clear()
+        suggestions.rebuild()
+        self.assertEqual(self.suggested("carol"), [])  # follows nobody any more
+
+    def test_batches_give_the_same_result(self):
+        suggestions.rebuild(max_pairs=1, limit=1)
+        self.assertEqual(self.suggested("alice"), [("dave", 2)])
+        self.assertEqual(self.suggested("dave"), [("bob", 1)])
+
+        graph = suggestions.FollowGraph.load()
+        whole = graph.candidates(graph.users)
+        batched = [graph.candidates(user_ids) for user_ids in graph.batches(max_pairs=2)]
+        self.assertGreater(len(batched), 1)
+        for array, parts in zip(whole, zip(*batched)):
+            self.assertEqual(array.tolist(), [value for part in parts for value in part.tolist()])
+
+    def test_endpoint_skips_accounts_followed_since_the_rebuild(self):
+        suggestions.rebuild()
+        alice = self.users["alice"]
+        self.client.force_authenticate(alice)
+        response = self.client.get(reverse("follow_suggestions"))
+        self.assertEqual(
+            [(row["user"]["username"], row["mutual_follows"]) for row in response.data], [("dave", 2), ("eve", 1)]
+        )
+
+        alice.following.add(self.users["dave"])
+        follow_graph.following_ids(alice.pk)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("follow_suggestions"), {"limit": 5})
+        self.assertEqual([row["user"]["username"] for row in response.data], ["eve"])
@@ -1,17 +1,27 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import RegisterView, LoginView, ProfileView, LogoutView, UserViewSet, FollowUserView, UnfollowUserView
+from .views import FollowSuggestionsView
+from .views import register_async, login_async
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 
 
+# under ASGI, password hashing is awaited instead of blocking a worker
+if settings.ASYNC_AUTH_VIEWS:
+    register_view, login_view = register_async, login_async
+else:
+    register_view, login_view = RegisterView.as_view(), LoginView.as_view()
+
 urlpatterns = [
-    path("register/", RegisterView.as_view(), name="register"),
-    path("login/", LoginView.as_view(), name="login"),
+    path("register/", register_view, name="register"),
+    path("login/", login_view, name="login"),
     path("profile/", ProfileView.as_view(), name="profile"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path("follow/<int:user_id>/", FollowUserView.as_view(), name="follow_user"),
     path("unfollow/<int:user_id>/", UnfollowUserView.as_view(), name="unfollow_user"),
+    path("suggestions/", FollowSuggestionsView.as_view(), name="follow_suggestions"),
     path("", include(router.urls)),
 ]
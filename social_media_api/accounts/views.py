@@ -1,16 +1,26 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import permissions
 from rest_framework.authtoken.models import Token
 from rest_framework.views import APIView
-from .models import CustomUser
 from rest_framework import viewsets
 from rest_framework.decorators import action
-from .serializers import UserSerializer
-from django.shortcuts import get_object_or_404
 
-from .serializers import RegisterSerializer, LoginSerializer, ProfileSerializer
+from notifications import dispatch
+from posts.fieldsets import SparseFieldsMixin
+from . import follow_graph, hashing, suggestions
+from .models import CustomUser, FollowSuggestion
+from .serializers import (
+    FollowSuggestionSerializer, LoginSerializer, ProfileSerializer, RegisterSerializer, UserSerializer,
+)
 
 
 class RegisterView(generics.CreateAPIView):
@@ -29,7 +39,7 @@ class LoginView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        serializer = LoginSerializer(data=request.data)
+        serializer = LoginSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
         token, _ = Token.objects.get_or_create(user=user)
@@ -53,7 +63,7 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -76,12 +86,15 @@ class UserViewSet(viewsets.ModelViewSet):
 class FollowUserView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, pk):
-        user_to_follow = get_object_or_404(CustomUser, pk=pk)
+    def post(self, request, user_id):
+        user_to_follow = get_object_or_404(CustomUser, pk=user_id)
         if request.user == user_to_follow:
             return Response({"error": "You cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
 
-        request.user.following.add(user_to_follow)
+        # decide from the through table: the cached adjacency set is per process and may be stale
+        if not request.user.following.filter(pk=user_to_follow.pk).exists():
+            request.user.following.add(user_to_follow)
+            dispatch.publish(recipient=user_to_follow, actor=request.user, verb="started following you")
         return Response({"status": f"You are now following {user_to_follow.username}"}, status=status.HTTP_200_OK)
 
 
@@ -89,7 +102,83 @@ class FollowUserView(generics.GenericAPIView):
 class UnfollowUserView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, pk):
-        user_to_unfollow = get_object_or_404(CustomUser, pk=pk)
-        request.user.following.remove(user_to_unfollow)
+    def post(self, request, user_id):
+        user_to_unfollow = get_object_or_404(CustomUser, pk=user_id)
+        request.user.following.remove(user_to_unfollow)  # idempotent; no cached pre-check
         return Response({"status": f"You unfollowed {user_to_unfollow.username}"}, status=status.HTTP_200_OK)
+
+
+class FollowSuggestionsView(APIView):
+    """Top "who to follow" candidates, precomputed by ``rebuild_follow_suggestions``."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", suggestions.LIMIT)), 1), suggestions.LIMIT)
+        except ValueError:
+            limit = suggestions.LIMIT
+        # one range scan of (user, -score); accounts followed since the last
+        # rebuild are skipped via the cached adjacency set, hence the over-fetch
+        followed = follow_graph.following_ids(request.user.pk)
+        rows = (
+            FollowSuggestion.objects.filter(user=request.user)
+            .select_related("candidate")
+            .order_by("-score", "candidate")[:limit * 2]
+        )
+        rows = [row for row in rows if row.candidate_id not in followed][:limit]
+        return Response(FollowSuggestionSerializer(rows, many=True, context={"request": request}).data)
+
+
+# ---------------------------------------------------------------------------
+# ASGI variants of register / login (selected in accounts/urls.py when
+# social_media_api/asgi.py is serving): the PBKDF2 work is awaited from the
+# hashing pool instead of blocking a worker.
+# ---------------------------------------------------------------------------
+
+def _request_data(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+    return {**request.POST.dict(), **request.FILES.dict()}
+
+
+def _overloaded(exc):
+    response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+    response["Retry-After"] = str(exc.wait)
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def register_async(request):
+    serializer = RegisterSerializer(data=_request_data(request))
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        password_hash = await hashing.ahash_password(serializer.validated_data["password"])
+    except hashing.HashingOverloaded as exc:
+        return _overloaded(exc)
+    user = await sync_to_async(serializer.save)(password_hash=password_hash)
+    data = await sync_to_async(lambda: serializer.data)()
+    token = await Token.objects.aget(user=user)
+    return JsonResponse({"user": data, "token": token.key}, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def login_async(request):
+    data = _request_data(request)
+    if not data.get("username") or not data.get("password"):
+        return JsonResponse({"detail": "username and password are required."}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        user = await hashing.aauthenticate(data["username"], data["password"], request)
+    except hashing.HashingOverloaded as exc:
+        return _overloaded(exc)
+    if user is None:
+        return JsonResponse(
+            {"non_field_errors": ["Invalid username or password."]}, status=status.HTTP_400_BAD_REQUEST
+        )
+    token, _ = await Token.objects.aget_or_create(user=user)
+    return JsonResponse({"token": token.key, "user_id": user.id})
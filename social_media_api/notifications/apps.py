@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notifications'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from . import dispatch
+        # buffered notifications are written after the response has gone out
+        request_finished.connect(dispatch.flush, dispatch_uid="notifications.dispatch.flush")
@@ -0,0 +1,151 @@
+# notifications/dispatch.py
+"""
+Notification dispatch pipeline.
+
+Views call ``publish()`` instead of ``Notification.objects.create``. The
+event goes to the backend named by ``settings.NOTIFICATION_BACKEND``:
+
+* ``BufferedBackend`` (default) collects events in process once the
+  request's transaction has committed and writes them with one
+  ``bulk_create`` after the response has been sent (``request_finished``)
+  or when the buffer is full.
+* ``OutboxBackend`` stores events in the NotificationOutbox table inside
+  the caller's transaction; ``manage.py process_notifications`` drains it
+  in batches. Use it when several processes/hosts serve the API.
+
+Likes, comments and follows all publish through here. Every committed
+batch also wakes the recipients' event streams (notifications/stream.py).
+"""
+import atexit
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Notification, NotificationOutbox
+from .stream import broker
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "NOTIFICATION_BATCH_SIZE", 500)
+
+
+@dataclass(frozen=True)
+class NotificationEvent:
+    recipient_id: int
+    actor_id: int
+    verb: str
+    target_ct_id: int = None
+    target_id: int = None
+
+    def to_notification(self):
+        return Notification(
+            recipient_id=self.recipient_id,
+            actor_id=self.actor_id,
+            verb=self.verb,
+            target_ct_id=self.target_ct_id,
+            target_id=self.target_id,
+        )
+
+
+def write_notifications(events):
+    """Persist events as Notification rows in batched INSERTs and wake the recipients' streams."""
+    rows = Notification.objects.bulk_create([event.to_notification() for event in events], batch_size=BATCH_SIZE)
+    recipients = {row.recipient_id for row in rows}
+    transaction.on_commit(lambda: broker.notify(recipients))
+    return rows
+
+
+class BufferedBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = []
+
+    def publish(self, event):
+        # only queue once the like/comment/follow row is actually committed
+        transaction.on_commit(lambda: self.enqueue(event))
+
+    def enqueue(self, event):
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= BATCH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+        try:
+            write_notifications(events)
+        except Exception:
+            logger.exception("Dropped %d notifications", len(events))
+            return 0
+        return len(events)
+
+
+class OutboxBackend:
+    def publish(self, event):
+        # same transaction as the action that caused it: both or neither
+        NotificationOutbox.objects.create(
+            recipient_id=event.recipient_id,
+            actor_id=event.actor_id,
+            verb=event.verb,
+            target_ct_id=event.target_ct_id,
+            target_id=event.target_id,
+        )
+
+    def flush(self):
+        return 0  # nothing is held in process
+
+    def drain(self, batch_size=BATCH_SIZE):
+        """Move up to ``batch_size`` outbox rows into Notification; returns how many."""
+        with transaction.atomic():
+            rows = list(NotificationOutbox.objects.select_for_update().order_by("id")[:batch_size])
+            if not rows:
+                return 0
+            write_notifications(
+                NotificationEvent(row.recipient_id, row.actor_id, row.verb, row.target_ct_id, row.target_id)
+                for row in rows
+            )
+            NotificationOutbox.objects.filter(id__in=[row.id for row in rows]).delete()
+        return len(rows)
+
+
+@lru_cache(maxsize=None)
+def _backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    return _backend(getattr(settings, "NOTIFICATION_BACKEND", "notifications.dispatch.BufferedBackend"))
+
+
+def publish(recipient, actor, verb, target=None):
+    """Queue a notification for ``recipient`` (skipped when users act on their own content)."""
+    recipient_id = getattr(recipient, "pk", recipient)
+    actor_id = getattr(actor, "pk", actor)
+    if recipient_id == actor_id:
+        return
+    event = NotificationEvent(
+        recipient_id=recipient_id,
+        actor_id=actor_id,
+        verb=verb,
+        target_ct_id=ContentType.objects.get_for_model(target).pk if target is not None else None,
+        target_id=target.pk if target is not None else None,
+    )
+    get_backend().publish(event)
+
+
+def flush(**kwargs):
+    """Write whatever the current backend holds in memory (request_finished receiver)."""
+    return get_backend().flush()
+
+
+atexit.register(flush)
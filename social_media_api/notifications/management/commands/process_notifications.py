@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatch import OutboxBackend
+
+
+class Command(BaseCommand):
+    help = 'Drains the notification outbox into Notification rows in batches (worker for OutboxBackend)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain what is pending and exit')
+
+    def handle(self, *args, **options):
+        backend = OutboxBackend()
+        total = 0
+        while True:
+            written = backend.drain(options['batch_size'])
+            total += written
+            if written:
+                self.stdout.write(f'Delivered {written} notifications')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Outbox empty, {total} notifications delivered.'))
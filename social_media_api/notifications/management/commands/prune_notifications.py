@@ -0,0 +1,50 @@
+import argparse
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notifications import retention
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes (or archives) read notifications older than the retention period, '
+        'in short primary-key batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=retention.RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=retention.BATCH_SIZE)
+        parser.add_argument(
+            '--archive', action=argparse.BooleanOptionalAction, default=retention.ARCHIVE,
+            help='Copy the rows into ArchivedNotification before deleting them',
+        )
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired notifications')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = retention.expired(timezone.now() - timedelta(days=options['days'])).count()
+            self.stdout.write(f'{count} read notifications are older than {options["days"]} days.')
+            return
+
+        def report(removed, seconds):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Batch: {removed} rows in {seconds * 1000:.1f}ms')
+
+        started = time.perf_counter()
+        stats = retention.prune(
+            days=options['days'], batch_size=options['batch_size'], archive=options['archive'],
+            pause=options['pause'], on_batch=report,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{stats.batches} batches, mean {stats.mean_duration * 1000:.1f}ms, max {stats.max_duration * 1000:.1f}ms, '
+            f'{stats.removed / elapsed if elapsed else 0:.0f} rows/s'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {stats.removed} read notifications older than {options["days"]} days'
+            f' ({stats.archived} archived).'
+        ))
@@ -15,6 +15,41 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            # unread counts / mark-read watermarks
+            models.Index(fields=["recipient", "is_read", "timestamp"], name="notif_recipient_read_ts_idx"),
+            # per-user listing in (timestamp, id) keyset order
+            models.Index(fields=["recipient", "-timestamp", "-id"], name="notif_recipient_ts_idx"),
+        ]
 
     def __str__(self):
         return f"{self.actor} {self.verb} {self.target} → {self.recipient}"
+
+
+class ArchivedNotification(models.Model):
+    """Compact copy of a pruned read notification (``prune_notifications --archive``)."""
+    id = models.BigIntegerField(primary_key=True)  # the original Notification id
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+", db_index=False)
+    verb = models.CharField(max_length=255)
+    target_ct = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, null=True, blank=True, related_name="+", db_index=False
+    )
+    target_id = models.PositiveIntegerField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+
+    def __str__(self):
+        return f"archived: {self.actor_id} {self.verb} → {self.recipient_id}"
+
+
+class NotificationOutbox(models.Model):
+    """Durable queue of notifications waiting for the process_notifications worker."""
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    verb = models.CharField(max_length=255)
+    target_ct = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    target_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"pending: {self.actor_id} {self.verb} → {self.recipient_id}"
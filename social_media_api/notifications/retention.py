@@ -0,0 +1,101 @@
+# notifications/retention.py
+"""
+Retention for read notifications (``manage.py prune_notifications``).
+
+Read notifications older than NOTIFICATION_RETENTION_DAYS are deleted, or
+moved to the compact ArchivedNotification table, in primary-key batches of
+NOTIFICATION_RETENTION_BATCH_SIZE. Each batch is its own short transaction,
+so the list endpoint and the notification writers never wait on one long
+DELETE. Unread notifications are kept whatever their age.
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+RETENTION_DAYS = getattr(settings, "NOTIFICATION_RETENTION_DAYS", 90)
+BATCH_SIZE = getattr(settings, "NOTIFICATION_RETENTION_BATCH_SIZE", 1000)
+ARCHIVE = getattr(settings, "NOTIFICATION_ARCHIVE", False)
+
+ARCHIVED_FIELDS = ["id", "recipient_id", "actor_id", "verb", "target_ct_id", "target_id", "timestamp"]
+
+
+@dataclass
+class PruneStats:
+    removed: int = 0
+    archived: int = 0
+    durations: list = field(default_factory=list)  # seconds per batch
+
+    @property
+    def batches(self):
+        return len(self.durations)
+
+    @property
+    def max_duration(self):
+        return max(self.durations, default=0.0)
+
+    @property
+    def mean_duration(self):
+        return sum(self.durations) / len(self.durations) if self.durations else 0.0
+
+
+def expired(cutoff):
+    return Notification.objects.filter(is_read=True, timestamp__lt=cutoff)
+
+
+def _id_bound(cutoff):
+    """First id at or past the cutoff; ids grow with timestamps, so batches stop there."""
+    return Notification.objects.filter(timestamp__gte=cutoff).order_by("id").values_list("id", flat=True).first()
+
+
+def _prune_batch(ids, archive):
+    with transaction.atomic():
+        archived = 0
+        if archive:
+            # rows archived by an earlier, interrupted run are neither copied nor counted again
+            already = ArchivedNotification.objects.filter(pk__in=ids).values("pk")
+            rows = Notification.objects.filter(pk__in=ids).exclude(pk__in=already).values(*ARCHIVED_FIELDS)
+            archived = len(ArchivedNotification.objects.bulk_create(
+                [ArchivedNotification(**row) for row in rows], ignore_conflicts=True
+            ))
+        removed, _ = Notification.objects.filter(pk__in=ids).delete()
+    return removed, archived
+
+
+def prune(days=RETENTION_DAYS, batch_size=BATCH_SIZE, archive=ARCHIVE, pause=0.0, on_batch=None):
+    """
+    Remove read notifications older than ``days``; returns PruneStats.
+    ``on_batch(removed, seconds)`` is called after every batch, ``pause``
+    seconds are slept between batches (lets replicas catch up).
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    candidates = expired(cutoff).order_by("id")
+    bound = _id_bound(cutoff)
+    if bound is not None:
+        candidates = candidates.filter(id__lt=bound)
+
+    stats = PruneStats()
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return stats
+        started = time.perf_counter()
+        removed, archived = _prune_batch(ids, archive)
+        elapsed = time.perf_counter() - started
+
+        last_id = ids[-1]
+        stats.removed += removed
+        stats.archived += archived
+        stats.durations.append(elapsed)
+        if on_batch is not None:
+            on_batch(removed, elapsed)
+        if len(ids) < batch_size:
+            return stats
+        if pause:
+            time.sleep(pause)
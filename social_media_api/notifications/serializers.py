@@ -0,0 +1,15 @@
+from rest_framework import serializers
+from .models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    actor_username = serializers.ReadOnlyField(source="actor.username")
+
+    class Meta:
+        model = Notification
+        fields = ["id", "actor", "actor_username", "verb", "target_ct", "target_id", "timestamp", "is_read"]
+        read_only_fields = fields
+
+
+class MarkReadSerializer(serializers.Serializer):
+    up_to = serializers.IntegerField(min_value=1)  # highest notification id the client has seen
@@ -0,0 +1,108 @@
+# notifications/stream.py
+"""
+Server-sent events for notifications (ASGI only).
+
+Connected clients wait on an in-process broker instead of polling the
+list endpoint. ``dispatch.write_notifications`` calls ``broker.notify``
+with the recipients of every batch it commits; each woken stream then reads
+only the rows newer than its watermark (``id > last event id``) and pushes
+them as ``id:``/``data:`` events. A client that reconnects sends
+``Last-Event-ID`` (EventSource does it automatically) and resumes there.
+
+The broker only sees notifications written by this process, so every
+keepalive tick also checks for new rows; writes made elsewhere (the outbox
+drainer, other hosts) arrive within NOTIFICATION_STREAM_KEEPALIVE seconds.
+"""
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+
+from .models import Notification
+from .serializers import NotificationSerializer
+
+KEEPALIVE = getattr(settings, "NOTIFICATION_STREAM_KEEPALIVE", 15)
+MAX_DURATION = getattr(settings, "NOTIFICATION_STREAM_MAX_SECONDS", 300)
+BATCH_SIZE = 100
+RETRY_MS = 3000
+
+
+class Broker:
+    """user id -> waiting streams, each an (event loop, asyncio.Queue) pair."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=1)  # a pending wake-up is enough, rows are re-read
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(entry)
+        return entry
+
+    def unsubscribe(self, user_id, entry):
+        with self._lock:
+            streams = self._subscribers.get(user_id, set())
+            streams.discard(entry)
+            if not streams:
+                self._subscribers.pop(user_id, None)
+
+    def notify(self, user_ids):
+        """Wake the streams of ``user_ids``; safe to call from any thread."""
+        with self._lock:
+            entries = [entry for user_id in user_ids for entry in self._subscribers.get(user_id, ())]
+        for loop, queue in entries:
+            loop.call_soon_threadsafe(_wake, queue)
+
+
+def _wake(queue):
+    if queue.empty():
+        queue.put_nowait(True)
+
+
+broker = Broker()
+
+
+def parse_last_event_id(request):
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        return max(0, int(raw))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_event(notification):
+    data = json.dumps(NotificationSerializer(notification).data, cls=DjangoJSONEncoder)
+    return f"id: {notification.pk}\nevent: notification\ndata: {data}\n\n"
+
+
+async def event_stream(user, last_id=None, max_duration=MAX_DURATION, keepalive=KEEPALIVE):
+    """Async generator of SSE frames for ``user``, starting after ``last_id``."""
+    entry = broker.subscribe(user.pk)  # before the first read, so nothing slips between
+    try:
+        if last_id is None:  # fresh connection: only what arrives from now on
+            latest = await Notification.objects.filter(recipient=user).aaggregate(latest=Max("id"))
+            last_id = latest["latest"] or 0
+        yield f"retry: {RETRY_MS}\n\n"
+
+        deadline = time.monotonic() + max_duration
+        while time.monotonic() < deadline:
+            rows = Notification.objects.filter(recipient=user, id__gt=last_id).select_related("actor")
+            sent = 0
+            async for notification in rows.order_by("id")[:BATCH_SIZE]:
+                last_id = notification.pk
+                sent += 1
+                yield format_event(notification)
+            if sent == BATCH_SIZE:
+                continue  # backlog left, read on before waiting
+            try:
+                await asyncio.wait_for(entry[1].get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(user.pk, entry)
@@ -1,3 +1,156 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from accounts.models import CustomUser
+from posts.benchmark import EndpointBudgetMixin
+from posts.models import Post
+from . import dispatch, retention, stream
+from .models import ArchivedNotification, Notification, NotificationOutbox
+from .views import notification_list_async
+
+
+class DispatchTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+        self.fan = CustomUser.objects.create_user(username="fan", password="password123")
+        self.post = Post.objects.create(title="hello", author=self.author)
+        self.client.force_authenticate(self.fan)
+
+    def test_like_notification_is_written_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("like-post", args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(dispatch.flush(), 1)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.recipient, notification.actor), (self.author, self.fan))
+        self.assertEqual(notification.target, self.post)
+
+    def test_no_notification_for_own_content(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch.publish(self.author, self.author, "liked your post", self.post)
+        self.assertEqual(dispatch.flush(), 0)
+
+    @override_settings(NOTIFICATION_BACKEND="notifications.dispatch.OutboxBackend")
+    def test_outbox_is_drained_in_batches(self):
+        for _ in range(5):
+            dispatch.publish(self.author, self.fan, "commented on your post", self.post)
+        self.assertEqual(NotificationOutbox.objects.count(), 5)
+        backend = dispatch.get_backend()
+        self.assertEqual(backend.drain(batch_size=3), 3)
+        self.assertEqual(backend.drain(batch_size=3), 2)
+        self.assertEqual(backend.drain(batch_size=3), 0)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 5)
+
+
+class NotificationEndpointBudgetTests(EndpointBudgetMixin, APITestCase):
+    """Query-count / latency budgets for the notification list."""
+
+    def test_notification_list(self):
+        def fetch():
+            self.assertEqual(self.client.get(reverse("notifications")).status_code, status.HTTP_200_OK)
+        self.assertWithinBudget("notifications", fetch)
+
+    def test_unread_count(self):
+        def fetch():
+            self.assertEqual(self.client.get(reverse("notifications-unread-count")).status_code, status.HTTP_200_OK)
+        self.assertWithinBudget("notifications_unread_count", fetch)
+
+
+class NotificationListTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="user", password="password123")
+        self.actor = CustomUser.objects.create_user(username="actor", password="password123")
+        self.notifications = [
+            Notification.objects.create(recipient=self.user, actor=self.actor, verb=f"event {i}") for i in range(5)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def test_list_pages_newest_first_without_marking_read(self):
+        response = self.client.get(reverse("notifications"), {"page_size": 3})
+        self.assertEqual([n["verb"] for n in response.data["results"]], ["event 4", "event 3", "event 2"])
+        self.assertEqual(response.data["results"][0]["actor_username"], "actor")
+        second = self.client.get(response.data["next"])
+        self.assertEqual([n["verb"] for n in second.data["results"]], ["event 1", "event 0"])
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 5)
+
+    def test_mark_read_up_to_watermark(self):
+        watermark = self.notifications[2].pk
+        response = self.client.post(reverse("notifications-mark-read"), {"up_to": watermark})
+        self.assertEqual(response.data, {"marked": 3})
+        response = self.client.get(reverse("notifications-unread-count"))
+        self.assertEqual(response.data, {"unread": 2})
+
+    async def test_async_list_matches_sync_list(self):
+        token = await Token.objects.acreate(user=self.user)
+        factory = AsyncRequestFactory()
+        request = factory.get("/", {"page_size": 3}, headers={"Authorization": f"Token {token.key}"})
+        data = json.loads((await notification_list_async(request)).content)
+        self.assertEqual([n["verb"] for n in data["results"]], ["event 4", "event 3", "event 2"])
+        self.assertIn("cursor=", data["next"])
+
+        response = await notification_list_async(factory.get("/"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_stream_resumes_after_last_event_id_and_pushes_new_rows(self):
+        events = stream.event_stream(self.user, last_id=self.notifications[2].pk, keepalive=5)
+        self.assertTrue((await anext(events)).startswith("retry:"))
+        self.assertTrue((await anext(events)).startswith(f"id: {self.notifications[3].pk}\n"))
+        self.assertTrue((await anext(events)).startswith(f"id: {self.notifications[4].pk}\n"))
+
+        waiting = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.05)
+        self.assertFalse(waiting.done())
+        new = await Notification.objects.acreate(recipient=self.user, actor=self.actor, verb="event 5")
+        stream.broker.notify({self.user.pk})
+        frame = await asyncio.wait_for(waiting, timeout=2)
+        self.assertTrue(frame.startswith(f"id: {new.pk}\nevent: notification\n"))
+        self.assertIn('"verb": "event 5"', frame)
+
+        await events.aclose()
+        self.assertEqual(stream.broker._subscribers, {})
+
+
+class RetentionTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="user", password="password123")
+        self.actor = CustomUser.objects.create_user(username="actor", password="password123")
+        rows = Notification.objects.bulk_create(
+            [Notification(recipient=self.user, actor=self.actor, verb="followed you") for _ in range(7)]
+        )
+        old = timezone.now() - timedelta(days=120)
+        # five old read rows, one old unread row, one recent read row
+        Notification.objects.filter(pk__in=[row.pk for row in rows[:6]]).update(timestamp=old, is_read=True)
+        Notification.objects.filter(pk=rows[5].pk).update(is_read=False)
+        Notification.objects.filter(pk=rows[6].pk).update(is_read=True)
+        self.kept = {rows[5].pk, rows[6].pk}
+
+    def test_prunes_old_read_rows_in_batches(self):
+        batches = []
+        stats = retention.prune(days=90, batch_size=2, on_batch=lambda removed, seconds: batches.append(removed))
+        self.assertEqual((stats.removed, stats.archived, batches), (5, 0, [2, 2, 1]))
+        self.assertEqual(set(Notification.objects.values_list("pk", flat=True)), self.kept)
+        self.assertFalse(ArchivedNotification.objects.exists())
+
+    def test_command_archives_before_deleting(self):
+        out = io.StringIO()
+        call_command("prune_notifications", "--archive", "--batch-size=3", stdout=out)
+        self.assertIn("Removed 5 read notifications older than 90 days (5 archived)", out.getvalue())
+        self.assertEqual(ArchivedNotification.objects.filter(recipient=self.user).count(), 5)
+        self.assertEqual(set(Notification.objects.values_list("pk", flat=True)), self.kept)
+
+    def test_rows_archived_earlier_are_not_counted_again(self):
+        first = Notification.objects.filter(is_read=True).order_by("pk").values(*retention.ARCHIVED_FIELDS)[:2]
+        ArchivedNotification.objects.bulk_create([ArchivedNotification(**row) for row in first])
+        stats = retention.prune(days=90, archive=True)
+        self.assertEqual((stats.removed, stats.archived), (5, 3))
+        self.assertEqual(ArchivedNotification.objects.count(), 5)
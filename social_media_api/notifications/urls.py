@@ -1,6 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from .views import NotificationListView
+from .views import NotificationListView, UnreadCountView, MarkReadView, notification_list_async, notification_stream
+
+# under ASGI the list is read with the async ORM
+list_view = notification_list_async if settings.ASYNC_READ_VIEWS else NotificationListView.as_view()
 
 urlpatterns = [
-    path("", NotificationListView.as_view(), name="notifications"),
+    path("", list_view, name="notifications"),
+    path("unread-count/", UnreadCountView.as_view(), name="notifications-unread-count"),
+    path("mark-read/", MarkReadView.as_view(), name="notifications-mark-read"),
 ]
+
+# server-sent events hold the connection open: only served under ASGI
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns.append(path("stream/", notification_stream, name="notifications-stream"))
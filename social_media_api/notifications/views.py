@@ -1,27 +1,66 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.http import JsonResponse, StreamingHttpResponse
+from accounts.authentication import async_api_view
+from posts.pagination import KeysetPagination
 from .models import Notification
+from .serializers import NotificationSerializer, MarkReadSerializer
+from . import stream
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ("-timestamp", "-id")
+
 
 class NotificationListView(generics.ListAPIView):
+    serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
-        return self.request.user.notifications.all()
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        unread = queryset.filter(is_read=False)
-        data = [
-            {
-                "actor": n.actor.username,
-                "verb": n.verb,
-                "timestamp": n.timestamp,
-                "is_read": n.is_read,
-            }
-            for n in queryset
-        ]
-
-        # ✅ mark unread as read when fetched
-        unread.update(is_read=True)
-
-        return Response(data)
+        # (recipient, timestamp) keyset pages; actor joined in the same query
+        return Notification.objects.filter(recipient=self.request.user).select_related("actor")
+
+
+@async_api_view(auth_required=True)
+async def notification_list_async(request):
+    """ASGI variant of NotificationListView (selected in notifications/urls.py)."""
+    paginator = NotificationPagination()
+    queryset = Notification.objects.filter(recipient=request.user).select_related("actor")
+    page = await paginator.apaginate_queryset(queryset, request.api)
+    data = NotificationSerializer(page, many=True, context={"request": request.api}).data
+    return JsonResponse(paginator.get_paginated_data(data))
+
+
+@async_api_view(auth_required=True)
+async def notification_stream(request):
+    """Server-sent events of new notifications; resumes after Last-Event-ID."""
+    response = StreamingHttpResponse(
+        stream.event_stream(request.user, stream.parse_last_event_id(request)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
+
+
+class UnreadCountView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        unread = Notification.objects.filter(recipient=request.user, is_read=False).count()
+        return Response({"unread": unread})
+
+
+class MarkReadView(APIView):
+    """Marks every notification up to (and including) id ``up_to`` as read."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked = Notification.objects.filter(
+            recipient=request.user, is_read=False, id__lte=serializer.validated_data["up_to"]
+        ).update(is_read=True)
+        return Response({"marked": marked}, status=status.HTTP_200_OK)
@@ -0,0 +1,243 @@
+# posts/benchmark.py
+"""
+Synthetic social graph + helpers for the endpoint performance suite.
+
+``seed()`` bulk-loads a deterministic dataset (users, follows, posts, tags,
+likes, comments, notifications) and the test cases in posts/, accounts/ and
+notifications/ check the query counts of the hot endpoints against the
+budgets in ``perf_budgets.json``. Wall-clock p50/p95 budgets depend on the
+machine, so they are only asserted with BENCHMARK_LATENCY=1 in the
+environment (perf runs on known hardware, not every CI job).
+"""
+import json
+import os
+import random
+import re
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from taggit.models import Tag, TaggedItem
+
+from notifications.models import Notification
+from . import counters, ranking, tags
+from .models import Post, Like, Comment, TimelineEntry
+
+BUDGETS_FILE = Path(settings.BASE_DIR) / "perf_budgets.json"
+BATCH_SIZE = 500
+CHECK_LATENCY = os.environ.get("BENCHMARK_LATENCY") == "1"
+
+
+def load_budgets():
+    with open(BUDGETS_FILE) as fh:
+        return json.load(fh)
+
+
+def seed(scale=None, rng_seed=1234):
+    """
+    Bulk-load the benchmark graph and return a dict describing it.
+    ``scale`` multiplies the sizes in perf_budgets.json (env BENCHMARK_SCALE).
+    """
+    if scale is None:
+        scale = float(os.environ.get("BENCHMARK_SCALE", 1))
+    sizes = {key: max(1, int(value * scale)) for key, value in load_budgets()["dataset"].items()}
+    rng = random.Random(rng_seed)
+    User = get_user_model()
+
+    password = make_password("benchmark-password")
+    User.objects.bulk_create(
+        [User(username=f"user{i}", email=f"user{i}@example.com", password=password) for i in range(sizes["users"])],
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+    viewer_id = user_ids[0]
+
+    # follow graph: everybody follows a random handful, the viewer follows more
+    Follow = User.following.through
+    follows = set()
+    for user_id in user_ids:
+        count = sizes["viewer_follows"] if user_id == viewer_id else sizes["follows_per_user"]
+        for followed_id in rng.sample(user_ids, min(count, len(user_ids))):
+            if followed_id != user_id:
+                follows.add((user_id, followed_id))
+    Follow.objects.bulk_create(
+        [Follow(from_customuser_id=a, to_customuser_id=b) for a, b in follows], batch_size=BATCH_SIZE
+    )
+
+    Post.objects.bulk_create(
+        [
+            Post(title=f"Post {i}", content=f"benchmark content {i} " * 5, author_id=rng.choice(user_ids))
+            for i in range(sizes["posts"])
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    posts = list(Post.objects.order_by("id").values_list("id", "author_id", "published_date"))
+    post_ids = [post_id for post_id, _, _ in posts]
+
+    Tag.objects.bulk_create(
+        [Tag(name=f"tag{i}", slug=f"tag{i}") for i in range(sizes["tags"])], batch_size=BATCH_SIZE
+    )
+    tag_ids = list(Tag.objects.values_list("id", flat=True))
+    post_ct = ContentType.objects.get_for_model(Post)
+    TaggedItem.objects.bulk_create(
+        [
+            TaggedItem(content_type=post_ct, object_id=post_id, tag_id=tag_id)
+            for post_id in post_ids
+            for tag_id in rng.sample(tag_ids, min(rng.randint(0, 3), len(tag_ids)))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    tags.rebuild_counts()
+
+    likes = {(rng.choice(user_ids), rng.choice(post_ids)) for _ in range(sizes["likes"])}
+    Like.objects.bulk_create([Like(user_id=u, post_id=p) for u, p in likes], batch_size=BATCH_SIZE)
+    Comment.objects.bulk_create(
+        [
+            Comment(post_id=rng.choice(post_ids), author_id=rng.choice(user_ids), content=f"comment {i}")
+            for i in range(sizes["comments"])
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    counters.reconcile()
+    ranking.update_scores(full=True)
+
+    # materialized timelines, as rebuild_timelines would produce them
+    posts_by_author = {}
+    for post_id, author_id, published_date in posts:
+        posts_by_author.setdefault(author_id, []).append((post_id, published_date))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, published_date=published_date)
+            for user_id, followed_id in follows
+            for post_id, published_date in posts_by_author.get(followed_id, ())
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    viewer_posts = [post_id for post_id, author_id, _ in posts if author_id == viewer_id] or post_ids[:1]
+    Notification.objects.bulk_create(
+        [
+            Notification(
+                recipient_id=viewer_id,
+                actor_id=rng.choice(user_ids),
+                verb="liked your post",
+                target_ct=post_ct,
+                target_id=rng.choice(viewer_posts),
+            )
+            for _ in range(sizes["viewer_notifications"])
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    viewer = User.objects.get(pk=viewer_id)
+    token, _ = Token.objects.get_or_create(user=viewer)
+    return {
+        "viewer": viewer,
+        "token": token.key,
+        "user_ids": user_ids,
+        "post_ids": post_ids,
+        "sizes": sizes,
+    }
+
+
+def measure(func, iterations, setup=None):
+    """
+    Run ``func`` repeatedly (``setup`` runs untimed before each call);
+    return (max query count, p50 ms, p95 ms).
+    """
+    timings = []
+    max_queries = 0
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        max_queries = max(max_queries, len(queries))
+    timings.sort()
+    p95_index = min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))
+    return max_queries, statistics.median(timings), timings[p95_index]
+
+
+HOT_TABLES = {
+    "posts_post", "posts_comment", "posts_like", "posts_timelineentry",
+    "notifications_notification", "taggit_taggeditem",
+}
+FULL_SCAN_RE = re.compile(r"SCAN (\w+)$")  # SQLite: "SCAN t" without "USING ... INDEX"
+TABLE_STEP_RE = re.compile(r"(?:SCAN|SEARCH) (\w+)")
+TEMP_SORT_RE = re.compile(r"USE TEMP B-TREE FOR (?:LAST TERM OF |RIGHT PART OF )?ORDER BY")  # no index order
+
+
+def unindexed_steps(func, tables=HOT_TABLES, sorts=True):
+    """
+    Run ``func`` and EXPLAIN (SQLite ``EXPLAIN QUERY PLAN``) every SELECT it
+    issued; return [(sql, plan step)] for full table scans of ``tables`` and
+    for ORDER BY sorts in a temp B-tree over rows read from ``tables``. The
+    sort step names no table: it sorts the rows of its sibling steps (same
+    parent), so a sort of an already-limited subquery is not reported.
+    ``sorts=False`` only reports the scans.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    steps = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            if not query["sql"].lstrip().upper().startswith("SELECT"):
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + query["sql"])
+            plan = cursor.fetchall()
+            hot_parents = {
+                row[1] for row in plan
+                if (match := TABLE_STEP_RE.match(row[-1])) and match.group(1) in tables
+            }
+            for row in plan:
+                match = FULL_SCAN_RE.match(row[-1])
+                full_scan = match and match.group(1) in tables
+                hot_sort = sorts and TEMP_SORT_RE.match(row[-1]) and row[1] in hot_parents
+                if full_scan or hot_sort:
+                    steps.append((query["sql"], row[-1]))
+    return steps
+
+
+class EndpointBudgetMixin:
+    """
+    Mixin for APITestCase classes: seeds the graph once per class and
+    provides ``assertWithinBudget(name, func)``.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cache.clear()  # cached graph/auth state must not leak between datasets
+        cls.budgets = load_budgets()
+        cls.graph = seed()
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.graph['token']}")
+
+    def assertWithinBudget(self, name, func, setup=None):
+        budget = self.budgets["endpoints"][name]
+        queries, p50, p95 = measure(func, self.budgets["iterations"], setup)
+        self.assertLessEqual(
+            queries, budget["max_queries"],
+            f"{name}: {queries} queries, budget is {budget['max_queries']} (N+1?)",
+        )
+        if CHECK_LATENCY:
+            self.assertLessEqual(p50, budget["p50_ms"], f"{name}: p50 {p50:.1f}ms over budget")
+            self.assertLessEqual(p95, budget["p95_ms"], f"{name}: p95 {p95:.1f}ms over budget")
+
+    def assertUsesIndexes(self, name, func, allow_sorts=False):
+        steps = unindexed_steps(func, sorts=not allow_sorts)
+        self.assertFalse(
+            steps, f"{name}: full table scans / sorts\n" + "\n".join(f"{step}: {sql}" for sql, step in steps)
+        )
@@ -0,0 +1,102 @@
+# posts/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for the post and comment viewsets.
+
+Validators are computed with one cheap query before anything is loaded or
+serialized:
+
+* lists: ``MAX(updated_at)`` and ``COUNT(*)`` of the filtered queryset,
+  plus the full path (page, cursor, filters) and the requesting user;
+* details: the object's ``updated_at``, plus the requesting user and the
+  ``?fields=`` / ``?omit=`` selection (normalized: order and duplicates
+  don't matter), since a sparse body is a different representation.
+
+Viewsets whose payload embeds a parent's fields list the parent's
+``updated_at`` in ``version_fields`` as well (comments carry their post's
+title): a list then adds the parent's MAX() and a detail uses the newer
+of the two timestamps.
+
+A matching ``If-None-Match`` / ``If-Modified-Since`` is answered with
+``304 Not Modified``. Lists only send an ETag: a deletion leaves
+``MAX(updated_at)`` unchanged, so a date alone would be a wrong validator.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .fieldsets import requested_fields
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest())
+
+
+def _selection(request):
+    selection = requested_fields(request)
+    if selection is None:
+        return ""
+    include, omit = selection
+    return f"{','.join(sorted(include or ()))};{','.join(sorted(omit))}"
+
+
+def detail_validators(request, version):
+    """(ETag, Last-Modified timestamp) of one object at ``version``."""
+    etag = make_etag("detail", request.user.pk, version.isoformat(), _selection(request))
+    return etag, int(version.timestamp())
+
+
+def not_modified(request, etag, last_modified=None):
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    For viewsets whose read permission does not depend on the object: the
+    detail validator is looked up before ``get_object()`` runs.
+    """
+
+    version_fields = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        latest = {f"latest_{i}": Max(field) for i, field in enumerate(self.version_fields)}
+        state = queryset.order_by().aggregate(**latest, count=Count("pk"))
+        etag = make_etag("list", request.get_full_path(), request.user.pk, *state.values())
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        response["ETag"] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        versions = self.get_queryset().model._default_manager.filter(**lookup).values_list(
+            *self.version_fields
+        ).first()
+        if versions is None:
+            return super().retrieve(request, *args, **kwargs)  # 404 as usual
+
+        version = max(versions)
+        etag, last_modified = detail_validators(request, version)
+        cached = not_modified(request, etag, last_modified)
+        if cached is not None:
+            return cached
+
+        response = super().retrieve(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
@@ -0,0 +1,66 @@
+# posts/counters.py
+"""
+Denormalized like / comment counters on Post.
+
+Counters are changed with a single atomic ``UPDATE ... SET n = n + 1`` so
+concurrent requests never lose increments, and ``reconcile`` recomputes
+them from the Like / Comment tables when they drift (bulk loads, crashes).
+Both also bump ``Post.updated_at`` so conditional GETs see the new counts.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Now
+
+from .models import Post, Like, Comment
+
+COUNTERS = {
+    "like_count": Like,
+    "comment_count": Comment,
+}
+
+
+def increment(post_ids, field, delta=1):
+    """Atomically add ``delta`` to ``field`` on the given posts (never below zero)."""
+    if not isinstance(post_ids, (list, tuple, set)):
+        post_ids = [post_ids]
+    posts = Post.objects.filter(pk__in=post_ids)
+    if delta < 0:
+        posts = posts.filter(**{f"{field}__gte": -delta})
+    return posts.update(**{field: F(field) + delta}, updated_at=Now())
+
+
+def _count_subquery(model):
+    counts = (
+        model.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def reconcile(post_ids=None, batch_size=1000):
+    """
+    Recompute the counters from the source tables, in id-ordered batches.
+    Returns the number of posts whose counters were wrong.
+    """
+    posts = Post.objects.order_by("pk")
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+
+    fixed = 0
+    last_pk = 0
+    while True:
+        batch = list(posts.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return fixed
+        last_pk = batch[-1]
+        actual = {field: _count_subquery(model) for field, model in COUNTERS.items()}
+        stale = list(
+            Post.objects.filter(pk__in=batch)
+            .annotate(**{f"actual_{field}": expression for field, expression in actual.items()})
+            .exclude(**{field: F(f"actual_{field}") for field in COUNTERS})
+            .values_list("pk", flat=True)
+        )
+        if stale:
+            fixed += Post.objects.filter(pk__in=stale).update(**actual, updated_at=Now())
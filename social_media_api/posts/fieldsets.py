@@ -0,0 +1,130 @@
+# posts/fieldsets.py
+"""
+Sparse fieldsets: ``?fields=id,title,author_username`` or ``?omit=comments``.
+
+``SparseFieldsSerializerMixin`` drops the unselected fields from a
+serializer on read requests (unknown names are a 400). ``SparseFieldsMixin``
+(or ``sparse_queryset`` in the async views) then trims the queryset to what
+the remaining fields read, so an omitted field costs no database work:
+
+* ``only()`` the columns behind the kept fields, plus the primary key and
+  the ordering columns (cursor positions are read from the rows);
+* ``select_related`` only the relations a kept field traverses;
+* drop the prefetches (tags, comment previews) nobody serializes.
+
+A field's work is found from its ``source``; fields that read the whole
+object (``source="*"``, method fields) declare theirs in the serializer's
+``field_dependencies`` or a ``dependencies`` attribute on the field.
+Annotations are the view's business: check ``view.wants(name)``.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+
+
+def _names(value):
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def requested_fields(request):
+    """(fields to keep or None for all, fields to omit), or None without a selection."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = getattr(request, "query_params", request.GET)
+    include = _names(params.get(FIELDS_PARAM, ""))
+    omit = _names(params.get(OMIT_PARAM, ""))
+    if not include and not omit:
+        return None
+    return include or None, omit
+
+
+class SparseFieldsSerializerMixin:
+    """Keeps only the fields selected by the request; the primary key always stays."""
+
+    field_dependencies = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selection = requested_fields(self.context.get("request"))
+        if selection is None:
+            return
+        include, omit = selection
+        unknown = ((include or set()) | omit) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({FIELDS_PARAM: [f"Unknown field: {name}" for name in sorted(unknown)]})
+
+        pk_name = self.Meta.model._meta.pk.name
+        for name in list(self.fields):
+            if name != pk_name and ((include is not None and name not in include) or name in omit):
+                self.fields.pop(name)
+
+    def get_dependencies(self, name, field):
+        """Model paths (``author__username``), attributes or prefetch names ``name`` reads."""
+        if name in self.field_dependencies:
+            return self.field_dependencies[name]
+        if hasattr(field, "dependencies"):
+            return field.dependencies
+        if field.source == "*":
+            return []
+        return [field.source.replace(".", "__")]
+
+
+def _prefetch_root(lookup):
+    return (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split("__")[0]
+
+
+def sparse_queryset(queryset, serializer, ordering=()):
+    """``queryset`` loading only what ``serializer``'s (already pruned) fields read."""
+    opts = queryset.model._meta
+    columns = {opts.pk.name}
+    related, prefetched = set(), set()
+
+    paths = [path for name, field in serializer.fields.items() for path in serializer.get_dependencies(name, field)]
+    paths += [field.lstrip("-") for field in ordering if isinstance(field, str) and field.lstrip("-") != "pk"]
+    for path in paths:
+        root, _, rest = path.partition("__")
+        try:
+            model_field = opts.get_field(root)
+        except FieldDoesNotExist:
+            prefetched.add(root)  # e.g. a Prefetch to_attr such as comment_preview
+            continue
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetched.add(root)
+        elif model_field.concrete:
+            columns.add(path)
+            if rest:
+                related.add(root)
+
+    lookups = [lookup for lookup in queryset._prefetch_related_lookups if _prefetch_root(lookup) in prefetched]
+    queryset = queryset.select_related(None).prefetch_related(None).prefetch_related(*lookups)
+    if related:  # select_related() without arguments would follow every relation
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """GenericAPIView mixin applying ``sparse_queryset`` to the filtered queryset."""
+
+    def sparse_serializer(self):
+        if not hasattr(self, "_sparse_serializer"):
+            selected = requested_fields(self.request) is not None
+            self._sparse_serializer = self.get_serializer() if selected else None
+        return self._sparse_serializer
+
+    def wants(self, name):
+        serializer = self.sparse_serializer()
+        return serializer is None or name in serializer.fields
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer = self.sparse_serializer()
+        if serializer is None:
+            return queryset
+        ordering = list(queryset.query.order_by)
+        if hasattr(self.paginator, "get_ordering"):
+            ordering += self.paginator.get_ordering(self.request, queryset, self)
+        return sparse_queryset(queryset, serializer, ordering)
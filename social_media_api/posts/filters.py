@@ -0,0 +1,23 @@
+# posts/filters.py
+from rest_framework.filters import SearchFilter
+
+from . import search
+
+
+class PostSearchFilter(SearchFilter):
+    """
+    ``?search=`` backed by the post token index (posts/search.py) instead of
+    ``icontains`` scans. Results come back best match first unless the
+    client asks for an explicit ``?ordering=``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not query.strip():
+            return queryset
+        ids = search.search_ids(query)
+        if not ids:
+            return queryset.none()
+        if "ordering" in request.query_params:
+            return queryset.filter(pk__in=ids)
+        return search.ranked(queryset, ids)
@@ -0,0 +1,121 @@
+# posts/images.py
+"""
+Image derivative pipeline for Post.image and CustomUser.profile_picture.
+
+The uploaded original is stored untouched; thumbnail/medium variants are
+rendered off the request thread (a small thread pool fed after the upload
+commits, or ``manage.py process_images`` for backlogs), EXIF-stripped,
+auto-rotated and re-encoded as WebP. The variant paths are recorded in a
+``<field>_variants`` JSON column, together with the source file they were
+made from so stale variants are easy to spot.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.exceptions import FieldDoesNotExist
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = getattr(settings, "IMAGE_VARIANTS", {"thumbnail": (150, 150), "medium": (800, 800)})
+FORMAT = "WEBP"
+EXTENSION = "webp"
+QUALITY = getattr(settings, "IMAGE_VARIANT_QUALITY", 80)
+IN_PROCESS = getattr(settings, "IMAGE_VARIANTS_IN_PROCESS", True)
+WORKERS = getattr(settings, "IMAGE_VARIANT_WORKERS", 2)
+
+_executor = None
+
+
+def variants_field(field_name):
+    return f"{field_name}_variants"
+
+
+def needs_variants(instance, field_name):
+    """True when the image is a real upload whose variants are missing or stale."""
+    field_file = getattr(instance, field_name)
+    if not field_file or field_file.name == instance._meta.get_field(field_name).get_default():
+        return False
+    return getattr(instance, variants_field(field_name)).get("source") != field_file.name
+
+
+def render(image, size):
+    """Encoded bytes of ``image`` scaled to fit ``size``, without EXIF/metadata."""
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(size)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    # a fresh image carries pixels only, so no EXIF/GPS/ICC leaks into the variant
+    clean = Image.new(image.mode, image.size)
+    clean.paste(image)
+    buffer = io.BytesIO()
+    clean.save(buffer, FORMAT, quality=QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(instance, field_name):
+    """Render and store every variant of ``instance.<field_name>``; returns the variants dict."""
+    field_file = getattr(instance, field_name)
+    storage = field_file.storage
+    if not field_file or not storage.exists(field_file.name):
+        return {}
+    with storage.open(field_file.name, "rb") as fh:
+        image = Image.open(fh)
+        image.load()
+
+    base = os.path.splitext(field_file.name)[0]
+    old = getattr(instance, variants_field(field_name)) or {}
+    variants = {"source": field_file.name}
+    for name, size in VARIANTS.items():
+        if old.get(name):
+            storage.delete(old[name])
+        variants[name] = storage.save(f"{base}_{name}.{EXTENSION}", ContentFile(render(image, size)))
+
+    # plain UPDATE: no post_save, so this never re-triggers the pipeline
+    changes = {variants_field(field_name): variants}
+    try:
+        instance._meta.get_field("updated_at")
+        changes["updated_at"] = Now()  # new URLs in the payload, see posts/conditional.py
+    except FieldDoesNotExist:
+        pass
+    type(instance)._default_manager.filter(pk=instance.pk).update(**changes)
+    setattr(instance, variants_field(field_name), variants)
+    return variants
+
+
+def _process(model_label, pk, field_name):
+    try:
+        instance = apps.get_model(model_label)._default_manager.filter(pk=pk).first()
+        if instance is not None and needs_variants(instance, field_name):
+            generate_variants(instance, field_name)
+    except Exception:
+        logger.exception("Could not render variants for %s %s.%s", model_label, pk, field_name)
+    finally:
+        close_old_connections()
+
+
+def schedule(instance, field_name):
+    """Queue variant rendering for after the current transaction commits."""
+    global _executor
+    if not IN_PROCESS or not needs_variants(instance, field_name):
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="image-variants")
+    label = instance._meta.label
+    transaction.on_commit(lambda: _executor.submit(_process, label, instance.pk, field_name))
+
+
+def variant_url(instance, field_name, variant, request=None):
+    """URL of a rendered variant, or None while it is still pending."""
+    path = (getattr(instance, variants_field(field_name)) or {}).get(variant)
+    if not path or needs_variants(instance, field_name):
+        return None
+    url = getattr(instance, field_name).storage.url(path)
+    return request.build_absolute_uri(url) if request is not None else url
@@ -0,0 +1,301 @@
+# posts/importer.py
+"""
+Bulk import of posts, comments, likes and tags (``manage.py import_posts``).
+
+Input is NDJSON (``export_posts`` output is valid input, gzipped or not) or
+CSV with the same keys as columns, one row per object:
+
+    {"type": "post", "id": 7, "title": "...", "content": "...", "author": "alice",
+     "published_date": "2026-01-01T10:00:00Z", "tags": ["django", "api"]}
+    {"type": "comment", "post_id": 7, "author": "bob", "content": "...", "tags": []}
+    {"type": "like", "post_id": 7, "user": "bob"}
+
+``id`` is optional; comments and likes refer to posts by id, so a dump that
+cross-references posts must keep them. CSV files may leave out ``type``
+(pass a default) and list tags comma-separated.
+
+Rows are processed IMPORT_CHUNK_SIZE at a time, each chunk in one
+transaction: one query resolves the chunk's usernames, ``bulk_create``
+writes each model, tags are resolved and attached with a handful of
+queries, and the counters of the touched posts are brought up to date. The same
+transaction advances a JobCheckpoint, so an interrupted import resumes
+after the last committed chunk. Rows naming an unknown user, or a post
+that neither exists nor comes in the same chunk, and posts or comments
+whose ``id`` is already taken are rejected and reported with their line
+number; the rest of the chunk is imported.
+
+``bulk_create`` skips model signals: the search index and home timelines
+are not updated (run ``rebuild_search_index`` / ``rebuild_timelines``) and
+tag counts are rebuilt once at the end. New posts get their initial score
+on the way in; ``update_post_scores`` rescores them with the imported
+likes and comments on its next run, as their updated_at is new.
+"""
+import csv
+import gzip
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from taggit.models import Tag, TaggedItem
+
+from . import counters, ranking, tags
+from .models import Comment, JobCheckpoint, Like, Post
+
+CHUNK_SIZE = getattr(settings, "IMPORT_CHUNK_SIZE", 2000)
+TYPES = ("post", "comment", "like")
+
+
+@dataclass
+class ImportStats:
+    rows: int = 0  # input rows read by this run (after the resume point)
+    created: dict = field(default_factory=lambda: dict.fromkeys(TYPES, 0))
+    rejected: list = field(default_factory=list)  # (line number, reason)
+    resumed_at: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _open(path):
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_rows(path, default_type=None, skip=0):
+    """Rows of an NDJSON or CSV file (``.csv`` / ``.csv.gz`` is CSV) as dicts, after ``skip`` rows."""
+    is_csv = ".csv" in Path(path).suffixes
+    with _open(path) as handle:
+        if is_csv:
+            for row in islice(csv.DictReader(handle), skip, None):
+                row = {key: value for key, value in row.items() if value not in ("", None)}
+                if "tags" in row:
+                    row["tags"] = [name.strip() for name in row["tags"].split(",") if name.strip()]
+                row.setdefault("type", default_type)
+                yield row
+        else:
+            lines = (line for line in handle if line.strip())
+            for line in islice(lines, skip, None):  # skipped lines are not parsed
+                row = json.loads(line)
+                row.setdefault("type", default_type)
+                yield row
+
+
+def checkpoint_name(path):
+    return f"import:{Path(path).resolve()}"
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _resolve_tags(names):
+    """name -> Tag id for ``names``, creating the missing tags in bulk."""
+    ids = dict(Tag.objects.filter(name__in=names).values_list("name", "id"))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name, slug=slugify(name)) for name in missing], ignore_conflicts=True)
+        ids.update(Tag.objects.filter(name__in=missing).values_list("name", "id"))
+        for name in missing:
+            if name not in ids:  # slug taken by another name: let taggit pick a unique one
+                ids[name] = Tag.objects.create(name=name).pk
+    return ids
+
+
+def _attach_tags(tagged):
+    """``tagged``: (model instance, tag names) pairs, instances already saved."""
+    names = {name for _, tag_names in tagged for name in tag_names}
+    if not names:
+        return
+    tag_ids = _resolve_tags(names)
+    items = []
+    for obj, tag_names in tagged:
+        content_type = ContentType.objects.get_for_model(obj)  # cached per model
+        items += [
+            TaggedItem(content_type=content_type, object_id=obj.pk, tag_id=tag_ids[name]) for name in set(tag_names)
+        ]
+    TaggedItem.objects.bulk_create(items, ignore_conflicts=True)
+
+
+def _restore_dates(model, objects, date_field, dates):
+    """
+    auto_now_add overwrites dates in bulk_create; put the imported ones back
+    with one executemany (bulk_update's CASE per row costs more than the insert).
+    """
+    field = model._meta.get_field(date_field)
+    connection = connections[router.db_for_write(model)]
+    params = [
+        (field.get_db_prep_save(value, connection), obj.pk) for obj, value in zip(objects, dates) if value is not None
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {connection.ops.quote_name(model._meta.db_table)} "
+                f"SET {connection.ops.quote_name(field.column)} = %s WHERE {connection.ops.quote_name('id')} = %s",
+                params,
+            )
+
+
+def _int_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _drop_taken_ids(model, entries, rejected):
+    """
+    ``entries``: (line, unsaved object, ...) tuples. Rejects the objects
+    whose explicit id already exists, or repeats an earlier row of the
+    chunk, instead of letting the insert fail the chunk (one query).
+    """
+    wanted = {entry[1].pk for entry in entries if entry[1].pk is not None}
+    taken = set(model.objects.filter(pk__in=wanted).values_list("pk", flat=True))
+    kept = []
+    for entry in entries:
+        line, obj = entry[:2]
+        if obj.pk in taken:
+            rejected.append((line, f"{model._meta.model_name} {obj.pk} already exists"))
+        else:
+            if obj.pk is not None:
+                taken.add(obj.pk)
+            kept.append(entry)
+    return kept
+
+
+def import_chunk(rows, first_line, stats):
+    """Write one chunk of rows; returns nothing, counts into ``stats``."""
+    User = get_user_model()
+    usernames = {row.get("author") or row.get("user") for row in rows} - {None}
+    users = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+
+    rejected = []
+    new_posts = []  # (line, post, published date, tag names)
+    dependents = []  # comment and like rows: (line, type, row, user id, post id)
+    for line, row in enumerate(rows, first_line):
+        kind = row.get("type")
+        user_id = users.get(row.get("author") or row.get("user"))
+        if kind not in TYPES:
+            rejected.append((line, f"unknown type {kind!r}"))
+        elif user_id is None:
+            rejected.append((line, f"unknown user {row.get('author') or row.get('user')!r}"))
+        elif kind != "like" and row.get("id") is not None and _int_id(row["id"]) is None:
+            rejected.append((line, f"invalid id {row['id']!r}"))
+        elif kind == "post":
+            published = _timestamp(row.get("published_date"))
+            post = Post(
+                id=_int_id(row.get("id")), title=row.get("title", ""), content=row.get("content"), author_id=user_id,
+                score=ranking.hot_score(0, 0, published or timezone.now()),
+            )
+            if row.get("image"):
+                post.image = row["image"]
+            new_posts.append((line, post, published, row.get("tags") or []))
+        elif _int_id(row.get("post_id")) is None:
+            rejected.append((line, "missing post_id"))
+        else:
+            dependents.append((line, kind, row, user_id, _int_id(row["post_id"])))
+
+    # explicit ids that are taken would raise IntegrityError and roll back the whole chunk
+    new_posts = _drop_taken_ids(Post, new_posts, rejected)
+    posts = [post for _, post, _, _ in new_posts]
+    post_dates = [published for _, _, published, _ in new_posts]
+    post_tags = [tag_names for *_, tag_names in new_posts]
+
+    # the post FK is only checked at commit, where one bad row would sink the whole chunk:
+    # comments and likes must point at a post of this chunk or an existing one (one query)
+    referenced = {post_id for *_, post_id in dependents}
+    known = {post.id for post in posts if post.id is not None}
+    known |= set(Post.objects.filter(pk__in=referenced - known).values_list("pk", flat=True))
+
+    new_comments = []  # (line, comment, created date, tag names)
+    like_pairs = set()
+    for line, kind, row, user_id, post_id in dependents:
+        if post_id not in known:
+            rejected.append((line, f"unknown post {post_id}"))
+        elif kind == "comment":
+            comment = Comment(
+                id=_int_id(row.get("id")), post_id=post_id, author_id=user_id, content=row.get("content", "")
+            )
+            new_comments.append((line, comment, _timestamp(row.get("created_at")), row.get("tags") or []))
+        else:
+            like_pairs.add((user_id, post_id))
+    new_comments = _drop_taken_ids(Comment, new_comments, rejected)
+    comments = [comment for _, comment, _, _ in new_comments]
+    comment_dates = [created for _, _, created, _ in new_comments]
+    comment_tags = [tag_names for *_, tag_names in new_comments]
+    if like_pairs:  # (user, post) is unique: count only the pairs that are new
+        like_pairs -= set(
+            Like.objects.filter(
+                user_id__in={user_id for user_id, _ in like_pairs}, post_id__in={post_id for _, post_id in like_pairs}
+            ).values_list("user_id", "post_id")
+        )
+    likes = [Like(user_id=user_id, post_id=post_id) for user_id, post_id in sorted(like_pairs)]
+
+    Post.objects.bulk_create(posts)
+    _restore_dates(Post, posts, "published_date", post_dates)
+    Comment.objects.bulk_create(comments)
+    _restore_dates(Comment, comments, "created_at", comment_dates)
+    Like.objects.bulk_create(likes, ignore_conflicts=True)  # a concurrent like may still win
+    _attach_tags(list(zip(posts, post_tags)) + list(zip(comments, comment_tags)))
+
+    # every comment row is new: add them up; likes are reconciled, as a concurrent like may have won
+    per_post = Counter(comment.post_id for comment in comments)
+    for delta in set(per_post.values()):
+        counters.increment([post_id for post_id, count in per_post.items() if count == delta], "comment_count", delta)
+    if likes:
+        counters.reconcile({like.post_id for like in likes})
+    stats.rejected += sorted(rejected)
+    stats.created["post"] += len(posts)
+    stats.created["comment"] += len(comments)
+    stats.created["like"] += len(likes)
+
+
+def import_file(path, chunk_size=CHUNK_SIZE, default_type=None, restart=False, on_chunk=None):
+    """
+    Import ``path`` in chunks, resuming after the last committed chunk
+    unless ``restart``; returns ImportStats. ``on_chunk(stats)`` runs after
+    every committed chunk.
+    """
+    checkpoint, _ = JobCheckpoint.objects.get_or_create(name=checkpoint_name(path))
+    done = 0 if restart else int(checkpoint.position or 0)
+    stats = ImportStats(resumed_at=done)
+
+    rows = read_rows(path, default_type, skip=done)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            import_chunk(chunk, done + 1, stats)
+            done += len(chunk)
+            checkpoint.position = str(done)
+            checkpoint.save(update_fields=["position", "updated_at"])
+        stats.rows += len(chunk)
+        if on_chunk is not None:
+            on_chunk(stats)
+
+    if stats.rows:
+        tags.rebuild_counts()
+    return stats
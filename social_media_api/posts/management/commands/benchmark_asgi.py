@@ -0,0 +1,99 @@
+import asyncio
+import statistics
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+
+from notifications.views import NotificationListView, notification_list_async
+from posts.models import Post
+from posts.views import FeedView, PostViewSet, _post_detail_read, feed_async
+
+
+def _summary(timings, elapsed):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    return len(timings) / elapsed, statistics.median(timings), p95
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares WSGI (threaded sync views) and ASGI (async views on one event loop) throughput '
+        'for the feed, post detail and notification list, driving both handlers in-process '
+        '(run seed_benchmark_data first)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='user0', help='Viewer whose token is used')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=64)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        post_id = Post.objects.order_by('-id').values_list('id', flat=True).first()
+        if user is None or post_id is None:
+            raise CommandError('No benchmark data; run `manage.py seed_benchmark_data` first.')
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': f'Token {token.key}'}
+
+        # both variants side by side, plus the real routes (serializers reverse them)
+        urlconf = types.ModuleType('benchmark_urls')
+        urlconf.urlpatterns = [
+            path('wsgi/feed/', FeedView.as_view()),
+            path('asgi/feed/', feed_async),
+            path('wsgi/posts/<int:pk>/', PostViewSet.as_view({'get': 'retrieve'})),
+            path('asgi/posts/<int:pk>/', _post_detail_read),
+            path('wsgi/notifications/', NotificationListView.as_view()),
+            path('asgi/notifications/', notification_list_async),
+            path('', include(settings.ROOT_URLCONF)),
+        ]
+        endpoints = {'feed': 'feed/', 'post_detail': f'posts/{post_id}/', 'notifications': 'notifications/'}
+
+        with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=['*']):
+            for name, url in endpoints.items():
+                for mode, runner in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                    rate, p50, p95 = runner(f'/{mode}/{url}', headers, options['requests'], options['concurrency'])
+                    self.stdout.write(
+                        f'{name:<14} {mode}  {rate:8.1f} req/s  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms'
+                    )
+        self.stdout.write(self.style.SUCCESS('Benchmark finished.'))
+
+    def run_wsgi(self, url, headers, total, concurrency):
+        """One sync worker thread per concurrent client, like a threaded WSGI server."""
+        def request(_):
+            start = time.perf_counter()
+            response = Client().get(url, headers=headers)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(request, range(total)))
+        return _summary(timings, time.perf_counter() - start)
+
+    def run_asgi(self, url, headers, total, concurrency):
+        """``concurrency`` in-flight requests on one event loop, like uvicorn with one worker."""
+        async def run():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def request():
+                async with slots:
+                    start = time.perf_counter()
+                    response = await client.get(url, headers=headers)
+                    if response.status_code != 200:
+                        raise CommandError(f'{url} returned {response.status_code}')
+                    return (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            timings = await asyncio.gather(*(request() for _ in range(total)))
+            return _summary(timings, time.perf_counter() - start)
+
+        return asyncio.run(run())
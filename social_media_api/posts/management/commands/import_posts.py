@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk-imports posts, comments, likes and tags from an NDJSON or CSV file in chunks, '
+        'resuming after the last committed chunk'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='.ndjson / .jsonl / .csv file, optionally .gz')
+        parser.add_argument('--type', choices=importer.TYPES, help='Row type for rows without a "type" column')
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE)
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the top')
+
+    def handle(self, *args, **options):
+        def report(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{stats.resumed_at + stats.rows} rows committed ({stats.rate:.0f} rows/s)')
+
+        try:
+            stats = importer.import_file(
+                options['path'], chunk_size=options['chunk_size'], default_type=options['type'],
+                restart=options['restart'], on_chunk=report,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Import failed: {exc}')
+
+        if stats.resumed_at:
+            self.stdout.write(f'Resumed after row {stats.resumed_at}.')
+        for line, reason in stats.rejected[:10]:
+            self.stderr.write(f'Row {line} skipped: {reason}')
+        if len(stats.rejected) > 10:
+            self.stderr.write(f'... and {len(stats.rejected) - 10} more rows skipped')
+        created = ', '.join(f'{count} {kind}s' for kind, count in stats.created.items())
+        self.stdout.write(f'{stats.rows} rows in {stats.elapsed:.1f}s ({stats.rate:.0f} rows/s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created}. Run rebuild_search_index and rebuild_timelines to index the new posts.'
+        ))
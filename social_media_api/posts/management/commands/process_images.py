@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import images
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Renders missing or stale image variants for post images and profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        targets = [(Post, 'image'), (get_user_model(), 'profile_picture')]
+        for model, field_name in targets:
+            rendered = 0
+            rows = (
+                model._default_manager.exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{field_name: ''})
+                .order_by('pk')
+            )
+            for instance in rows.iterator(chunk_size=options['batch_size']):
+                if images.needs_variants(instance, field_name) and images.generate_variants(instance, field_name):
+                    rendered += 1
+            self.stdout.write(f'{model._meta.label}.{field_name}: rendered variants for {rendered} rows')
+        self.stdout.write(self.style.SUCCESS('Image variants up to date.'))
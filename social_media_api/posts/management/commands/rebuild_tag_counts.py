@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the tag cloud counters from taggit TaggedItem rows (after bulk loads)'
+
+    def handle(self, *args, **options):
+        count = tags.rebuild_counts()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {count} tags.'))
@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds materialized home timelines (all users, or only the given ids)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Only rebuild these users')
+        parser.add_argument(
+            '--cold-only', action='store_true',
+            help='Skip users that already have timeline entries',
+        )
+        parser.add_argument(
+            '--trim', action='store_true',
+            help='Only cut timelines back to TIMELINE_MAX_LENGTH entries (run periodically)',
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+        if options['cold_only']:
+            users = users.filter(timeline_entries__isnull=True)
+
+        if options['trim']:
+            trimmed = removed = 0
+            users = users.filter(timeline_entries__isnull=False)
+            for user_id in users.values_list('id', flat=True).distinct().iterator():
+                removed += timeline.trim_timeline(user_id)
+                trimmed += 1
+            self.stdout.write(self.style.SUCCESS(f'Trimmed {trimmed} timelines ({removed} entries removed).'))
+            return
+
+        rebuilt = entries = 0
+        for user_id in users.values_list('id', flat=True).distinct().iterator():
+            entries += timeline.rebuild_timeline(user_id)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} timelines ({entries} entries).'))
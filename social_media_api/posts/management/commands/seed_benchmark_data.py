@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Loads the synthetic benchmark graph described in perf_budgets.json (use an empty database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=None, help='Multiplier for the dataset sizes')
+
+    def handle(self, *args, **options):
+        graph = benchmark.seed(scale=options['scale'])
+        sizes = ', '.join(f'{key}={value}' for key, value in graph['sizes'].items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded benchmark data ({sizes}); viewer token {graph["token"]}'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Post.score for posts touched since the last run (ranked feed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--full', action='store_true', help='Rescore every post, ignoring the checkpoint')
+        parser.add_argument('--interval', type=float, default=None, help='Keep running, every N seconds')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            updated = ranking.update_scores(batch_size=options['batch_size'], full=full)
+            self.stdout.write(f'Rescored {updated} posts')
+            if options['interval'] is None:
+                break
+            full = False
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Post scores up to date.'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:58
+
+from django.db import migrations, OperationalError
+
+FTS_TABLE = "posts_post_fts"
+
+
+def create_fts_table(apps, schema_editor):
+    # Only SQLite builds with FTS5 get the virtual table; everything else
+    # (and SQLite without FTS5) uses the PostSearchToken inverted index.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, content, tags, tokenize = 'unicode61')"
+        )
+    except OperationalError:
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_postsearchtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
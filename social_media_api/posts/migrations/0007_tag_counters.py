@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_fts5'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='taggit.tag')),
+                ('count', models.IntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagDailyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='taggit.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'tag'], name='tagdaily_day_tag_idx')],
+                'unique_together': {('tag', 'day')},
+            },
+        ),
+    ]
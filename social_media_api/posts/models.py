@@ -1,12 +1,39 @@
 from django.db import models
 from django.conf import settings   # ✅ use AUTH_USER_MODEL
 from taggit.managers import TaggableManager
+from taggit.models import Tag
+
+
+class PostQuerySet(models.QuerySet):
+    def with_comment_preview(self, size=None):
+        """
+        Prefetch the latest ``size`` comments of every post into
+        ``post.comment_preview`` with a single windowed (ROW_NUMBER) query.
+        """
+        if size is None:
+            size = getattr(settings, "POST_COMMENT_PREVIEW_SIZE", 3)
+        latest = Comment.objects.select_related("author").order_by("-created_at", "-id")[:size]
+        return self.prefetch_related(models.Prefetch("comments", queryset=latest, to_attr="comment_preview"))
+
+    def with_liked_by(self, user):
+        """Annotate ``liked_by_me`` for ``user`` (an EXISTS subquery, no extra query)."""
+        if user is None or not user.is_authenticated:
+            return self.annotate(liked_by_me=models.Value(False))
+        return self.annotate(
+            liked_by_me=models.Exists(Like.objects.filter(post=models.OuterRef("pk"), user_id=user.pk))
+        )
+
+    def for_api(self, user=None):
+        """Everything PostSerializer reads, loaded in a constant number of queries."""
+        return self.select_related("author").prefetch_related("tags").with_comment_preview().with_liked_by(user)
 
 
 class Post(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField(null=True, blank=True)
     published_date = models.DateTimeField(auto_now_add=True)
+    # bumped by every change that shows up in the API payload (see posts/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,   # ✅ changed here
         on_delete=models.CASCADE,
@@ -18,9 +45,18 @@ class Post(models.Model):
         null=True,
         default="images/default.jpg"
     )
+    image_variants = models.JSONField(default=dict, blank=True)  # filled by posts/images.py
 
     tags = TaggableManager()  # Django Taggit for tagging functionality
 
+    # Denormalized engagement counters, kept in sync by posts/counters.py
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # "hot" rank for ?ranking=top, maintained by posts/ranking.py
+    score = models.FloatField(default=0, db_index=True)
+
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -28,6 +64,12 @@ class Post(models.Model):
         ordering = ["-published_date"]
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
+        indexes = [
+            # post list keyset pages (published_date, id)
+            models.Index(fields=["-published_date", "-id"], name="post_date_idx"),
+            # profile pages / timeline backfill: one author's latest posts
+            models.Index(fields=["author", "-published_date", "-id"], name="post_author_date_idx"),
+        ]
 
 class Like(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="likes")
@@ -50,8 +92,76 @@ class Comment(models.Model):
     )
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     tags = TaggableManager()  # Django Taggit for tagging functionality
 
+    class Meta:
+        indexes = [
+            # a post's thread in (created_at, id) keyset order, and the comment preview
+            models.Index(fields=["post", "-created_at", "-id"], name="comment_post_created_idx"),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author} on {self.post.title}"
+
+
+class TimelineEntry(models.Model):
+    """One post in a user's precomputed home timeline (fan-out on write)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    published_date = models.DateTimeField()  # copied from the post so the timeline sorts on its own index
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "-published_date", "-post"], name="timeline_user_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} in {self.user_id}'s timeline"
+
+
+class PostSearchToken(models.Model):
+    """Inverted index row: ``term`` occurs in ``post`` with a field-weighted score."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="search_tokens")
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ("term", "post")  # also the (term, ...) range index used for prefix lookups
+
+    def __str__(self):
+        return f"{self.term} → {self.post_id}"
+
+
+class TagCount(models.Model):
+    """Running number of tagged posts/comments per tag (tag cloud)."""
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name="usage")
+    count = models.IntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.tag_id}: {self.count}"
+
+
+class TagDailyCount(models.Model):
+    """Tag applications per day (trending tags over a sliding window)."""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="daily_usage")
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("tag", "day")
+        indexes = [models.Index(fields=["day", "tag"], name="tagdaily_day_tag_idx")]
+
+    def __str__(self):
+        return f"{self.tag_id} on {self.day}: {self.count}"
+
+
+class JobCheckpoint(models.Model):
+    """Resume position of an incremental background job (e.g. the post scorer)."""
+    name = models.CharField(max_length=100, primary_key=True)
+    position = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
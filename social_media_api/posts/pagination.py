@@ -1,7 +1,229 @@
 # posts/pagination.py
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.template import loader
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
 class PostPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"  # allows ?page_size=10
     max_page_size = 100
+
+
+def encode_cursor(values, reverse=False):
+    """Opaque, url-safe cursor for a keyset position."""
+    payload = {"p": [str(value) for value in values]}
+    if reverse:
+        payload["r"] = 1
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _key_field(queryset, name):
+    """The model field (or annotation output field) a key column holds."""
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    return queryset.model._meta.get_field(name)
+
+
+def decode_cursor(cursor, queryset, ordering):
+    """Inverse of encode_cursor; returns (values, reverse) or raises NotFound."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [
+            _key_field(queryset, field.lstrip("-")).to_python(value)
+            for field, value in zip(ordering, payload["p"], strict=True)
+        ]
+    except Exception:
+        raise NotFound("Invalid cursor")
+    return values, bool(payload.get("r"))
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Q object selecting the rows strictly after ``values`` in ``ordering``
+    (or strictly before them when ``reverse``), i.e. the lexicographic
+    comparison (a, b) < (x, y)  ==  a < x OR (a = x AND b < y).
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        descending = field.startswith("-")
+        lookup = "lt" if descending != reverse else "gt"
+        term = Q(**{f"{name}__{lookup}": values[i]})
+        for prev_field, prev_value in zip(ordering[:i], values[:i]):
+            term &= Q(**{prev_field.lstrip("-"): prev_value})
+        condition |= term
+    return condition
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith("-") else f"-{field}" for field in ordering]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique composite key such as (published_date, id).
+
+    Each page is a single indexed range query (no COUNT, no OFFSET).
+    Passing ``?page=`` (or ``?ordering=`` / ``?search=``, whose order a
+    fixed key cannot honour) switches to classic page-number pagination,
+    which is handy in the browsable API.
+    """
+    ordering = ("-id",)
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_number_class = PostPagination
+    template = "rest_framework/pagination/previous_and_next.html"
+
+    def __init__(self):
+        self.page_number_paginator = None
+        self.has_next = self.has_previous = False
+
+    def get_ordering(self, request, queryset, view):
+        return list(self.ordering)
+
+    def use_page_numbers(self, request, view):
+        params = request.query_params
+        return any(
+            param in params
+            for param in (self.page_number_class.page_query_param, api_settings.ORDERING_PARAM, api_settings.SEARCH_PARAM)
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_page_numbers(request, view):
+            self.page_number_paginator = self.page_number_class()
+            return self.page_number_paginator.paginate_queryset(queryset, request, view)
+        return self._set_page(list(self._page_query(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views; ``request`` is a DRF Request."""
+        if self.use_page_numbers(request, view):
+            self.page_number_paginator = self.page_number_class()
+            return await sync_to_async(self.page_number_paginator.paginate_queryset)(queryset, request, view)
+        query = self._page_query(queryset, request, view)
+        return self._set_page([row async for row in query.aiterator(chunk_size=self._page_size + 1)])
+
+    def _page_query(self, queryset, request, view):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.key = self.get_ordering(request, queryset, view)
+        self._page_size = self.get_page_size(request)
+
+        self._cursor = request.query_params.get(self.cursor_query_param)
+        self._reverse = False
+        if self._cursor:
+            values, self._reverse = decode_cursor(self._cursor, queryset, self.key)
+            queryset = queryset.filter(keyset_filter(self.key, values, self._reverse))
+
+        ordering = reverse_ordering(self.key) if self._reverse else self.key
+        return queryset.order_by(*ordering)[:self._page_size + 1]
+
+    def _set_page(self, rows):
+        has_more = len(rows) > self._page_size
+        rows = rows[:self._page_size]
+        if self._reverse:
+            rows.reverse()
+
+        # Going forward there is a previous page iff we came from a cursor;
+        # going backwards there is always a next page (the one we came from).
+        self.has_next = has_more if not self._reverse else True
+        self.has_previous = bool(self._cursor) if not self._reverse else has_more
+        self.page = rows
+        return rows
+
+    def position(self, row):
+        return [getattr(row, field.lstrip("-")) for field in self.key]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, encode_cursor(self.position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        cursor = encode_cursor(self.position(self.page[0]), reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        """The response body as a plain dict (async views render it themselves)."""
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data).data
+        return OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ])
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_html_context(self):
+        return {"previous_url": self.get_previous_link(), "next_url": self.get_next_link()}
+
+    @property
+    def display_page_controls(self):
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.display_page_controls
+        return self.has_next or self.has_previous
+
+    def to_html(self):
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.to_html()
+        return loader.get_template(self.template).render(self.get_html_context())
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering = ("-published_date", "-id")
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class FeedPagination(PostCursorPagination):
+    """Newest first, or by precomputed score with ``?ranking=top`` (see posts/ranking.py)."""
+    # the timeline entry's copy of (published_date, post), annotated by
+    # timeline.timeline_posts, so pages are read off timeline_user_date_idx
+    ordering = ("-timeline_date", "-timeline_post")
+    ranked_ordering = ("-score", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get("ranking") == "top":
+            return list(self.ranked_ordering)
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,172 @@
+# posts/search.py
+"""
+Full-text search over posts (title, content, tags).
+
+Two interchangeable backends keep a token index up to date from the post
+signals in posts/signals.py:
+
+* ``Fts5Backend``: the ``posts_post_fts`` virtual table, created by
+  migration 0006 when the database is SQLite built with FTS5; ranked with
+  bm25().
+* ``InvertedIndexBackend``: the PostSearchToken table (term, post, weight),
+  used everywhere else. Prefix lookups are ``LIKE 'token%'`` seeks on ``term``.
+
+Every query token is prefix-matched and all tokens must match.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+
+from .models import Post, PostSearchToken
+
+FTS_TABLE = "posts_post_fts"
+RESULT_LIMIT = getattr(settings, "SEARCH_RESULT_LIMIT", 200)
+FIELD_WEIGHTS = {"title": 3, "tags": 2, "content": 1}
+MAX_QUERY_TOKENS = 8
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Lower-cased word tokens of at least two characters."""
+    return [token[:64] for token in TOKEN_RE.findall((text or "").lower()) if len(token) > 1]
+
+
+def query_tokens(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+
+
+def _document(post, tag_names=None):
+    if tag_names is None:
+        tag_names = [tag.name for tag in post.tags.all()]
+    return {"title": post.title, "content": post.content or "", "tags": " ".join(tag_names)}
+
+
+class InvertedIndexBackend:
+    def index(self, post, tag_names=None):
+        weights = {}
+        for field, text in _document(post, tag_names).items():
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+        PostSearchToken.objects.filter(post_id=post.pk).delete()
+        PostSearchToken.objects.bulk_create(
+            [PostSearchToken(term=term, post_id=post.pk, weight=weight) for term, weight in weights.items()]
+        )
+
+    def remove(self, post_ids):
+        PostSearchToken.objects.filter(post_id__in=post_ids).delete()
+
+    def clear(self):
+        PostSearchToken.objects.all().delete()
+
+    def search(self, query, limit=RESULT_LIMIT):
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+        # LIKE 'token%' (escaped): a sargable prefix seek under any collation
+        matches = [Q(term__startswith=token) for token in tokens]
+        per_token = {f"match_{i}": Count("pk", filter=match) for i, match in enumerate(matches)}
+        rows = (
+            PostSearchToken.objects.filter(reduce(or_, matches))
+            .values("post_id")
+            .annotate(score=Sum("weight"), **per_token)
+            .filter(**{f"{name}__gt": 0 for name in per_token})
+            .order_by("-score", "-post_id")
+            .values_list("post_id", flat=True)[:limit]
+        )
+        return list(rows)
+
+
+class Fts5Backend:
+    def __init__(self, using="default"):
+        self.using = using
+
+    def _execute(self, sql, params=()):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def index(self, post, tag_names=None):
+        document = _document(post, tag_names)
+        self._execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post.pk])
+        self._execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)",
+            [post.pk, document["title"], document["content"], document["tags"]],
+        )
+
+    def remove(self, post_ids):
+        for post_id in post_ids:
+            self._execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post_id])
+
+    def clear(self):
+        self._execute(f"DELETE FROM {FTS_TABLE}")
+
+    def search(self, query, limit=RESULT_LIMIT):
+        tokens = query_tokens(query)
+        if not tokens:
+            return []
+        match = " ".join(f'"{token}"*' for token in tokens)  # implicit AND of prefix terms
+        weights = ", ".join(str(float(FIELD_WEIGHTS[field])) for field in ("title", "content", "tags"))
+        rows = self._execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in rows]
+
+
+_fts_available = {}
+
+
+def get_backend(using="default"):
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = (
+            connection.vendor == "sqlite" and FTS_TABLE in connection.introspection.table_names()
+        )
+    return Fts5Backend(using) if _fts_available[using] else InvertedIndexBackend()
+
+
+def index_post(post, tag_names=None):
+    get_backend().index(post, tag_names)
+
+
+def remove_posts(post_ids):
+    get_backend().remove(post_ids)
+
+
+def search_ids(query, limit=RESULT_LIMIT):
+    """Ids of the best matching posts, best first."""
+    return get_backend().search(query, limit)
+
+
+def ranked(queryset, ids):
+    """Restrict ``queryset`` to ``ids`` and order it the same way."""
+    rank = Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by("search_rank")
+
+
+def search_posts(query, queryset=None, limit=RESULT_LIMIT):
+    ids = search_ids(query, limit)
+    if queryset is None:
+        queryset = Post.objects.all()
+    return ranked(queryset, ids) if ids else queryset.none()
+
+
+def rebuild_index(batch_size=500):
+    """Re-index every post from scratch; returns the number of posts indexed."""
+    backend = get_backend()
+    backend.clear()
+    indexed = 0
+    last_pk = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_pk).order_by("pk").prefetch_related("tags")[:batch_size])
+        if not batch:
+            return indexed
+        for post in batch:
+            backend.index(post, [tag.name for tag in post.tags.all()])
+        indexed += len(batch)
+        last_pk = batch[-1].pk
@@ -1,10 +1,34 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from taggit.serializers import TagListSerializerField, TaggitSerializer
+from . import images
+from .fieldsets import SparseFieldsSerializerMixin
 from .models import Post, Comment
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class ImageVariantField(serializers.Field):
+    """Read-only URL of a rendered image variant (None until the worker has made it)."""
+
+    def __init__(self, image_field, variant, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        self.image_field = image_field
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    @property
+    def dependencies(self):  # see posts/fieldsets.py
+        return [self.image_field, images.variants_field(self.image_field)]
+
+    def to_representation(self, instance):
+        return images.variant_url(instance, self.image_field, self.variant, self.context.get("request"))
+
+
+class CommentSerializer(SparseFieldsSerializerMixin, TaggitSerializer, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source="author.username")
     post_title = serializers.ReadOnlyField(source="post.title")
+    tags = TagListSerializerField(required=False)
 
     class Meta:
         model = Comment
@@ -29,9 +53,26 @@ class CommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class CommentPreviewSerializer(serializers.ModelSerializer):
+    """Slim comment used in post listings; needs only select_related("author")."""
     author_username = serializers.ReadOnlyField(source="author.username")
-    comments = CommentSerializer(many=True, read_only=True)  # ✅ nested comments
+
+    class Meta:
+        model = Comment
+        fields = ["id", "author", "author_username", "content", "created_at"]
+
+
+class PostSerializer(SparseFieldsSerializerMixin, TaggitSerializer, serializers.ModelSerializer):
+    author_username = serializers.ReadOnlyField(source="author.username")
+    tags = TagListSerializerField(required=False)
+    image_thumbnail = ImageVariantField("image", "thumbnail")
+    image_medium = ImageVariantField("image", "medium")
+    liked_by_me = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()  # ✅ latest few comments only
+    comments_url = serializers.SerializerMethodField()  # full thread lives here
+
+    # what the method fields read, for ?fields= / ?omit= (posts/fieldsets.py)
+    field_dependencies = {"liked_by_me": [], "comments": ["comment_preview"], "comments_url": []}
 
     class Meta:
         model = Post
@@ -43,13 +84,41 @@ class PostSerializer(serializers.ModelSerializer):
             "author",
             "author_username",
             "image",
+            "image_thumbnail",
+            "image_medium",
             "tags",
+            "like_count",
+            "comment_count",
+            "liked_by_me",
             "comments",
+            "comments_url",
         ]
-        read_only_fields = ["author", "published_date"]
+        read_only_fields = ["author", "published_date", "like_count", "comment_count"]
+
+    def get_liked_by_me(self, obj):
+        # Annotated by Post.objects.with_liked_by() for the whole page
+        return getattr(obj, "liked_by_me", False)
+
+    def get_comments(self, obj):
+        # Filled by Post.objects.with_comment_preview(); fall back for single objects
+        preview = getattr(obj, "comment_preview", None)
+        if preview is None:
+            size = getattr(settings, "POST_COMMENT_PREVIEW_SIZE", 3)
+            preview = obj.comments.select_related("author").order_by("-created_at", "-id")[:size]
+        return CommentPreviewSerializer(preview, many=True, context=self.context).data
+
+    def get_comments_url(self, obj):
+        return reverse("post-comments", kwargs={"pk": obj.pk}, request=self.context.get("request"))
 
     def create(self, validated_data):
         request = self.context.get("request")
         if request and hasattr(request, "user"):
             validated_data["author"] = request.user
         return super().create(validated_data)
+
+
+class BulkLikeSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=["like", "unlike"])
+    post_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100
+    )
@@ -1,6 +1,15 @@
 # posts/signals.py
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Now
+from django.db.models.signals import post_save, post_delete, m2m_changed, pre_save
+from django.utils import timezone
 from django.dispatch import receiver
+
+from taggit.models import TaggedItem
+
+from accounts import follow_graph
+from . import counters, images, ranking, search, tags, timeline
+from .models import Post, Like, Comment
 # from django.contrib.auth.models import User
 
 
@@ -9,4 +18,105 @@ from django.dispatch import receiver
 #     if created:
 #         Profile.objects.create(user=instance)
 #     else:
-#        instance.profile.save()
\ No newline at end of file
+#        instance.profile.save()
+
+
+@receiver(m2m_changed, sender=get_user_model().following.through)
+def sync_timelines_on_follow_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep materialized timelines in step with follow / unfollow."""
+    if action == "pre_clear":
+        # pk_set is not provided for clear(), so trim everything the instance touches
+        if reverse:
+            timeline.remove_author(follow_graph.follower_ids(instance.pk), [instance.pk])
+        else:
+            timeline.remove_author([instance.pk], follow_graph.following_ids(instance.pk))
+        return
+
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    # forward: instance follows pk_set / reverse: pk_set follow instance
+    pairs = [(pk, instance.pk) for pk in pk_set] if reverse else [(instance.pk, pk) for pk in pk_set]
+    for user_id, author_id in pairs:
+        if action == "post_add":
+            timeline.backfill_author(user_id, author_id)
+        else:
+            timeline.remove_author([user_id], [author_id])
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+def increment_post_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        field = "like_count" if sender is Like else "comment_count"
+        counters.increment(instance.post_id, field, 1)
+
+
+@receiver(post_save, sender=Comment)
+def touch_post_on_comment_edit(sender, instance, created, raw=False, **kwargs):
+    # edited comments show up in the post's embedded preview
+    if not created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(updated_at=Now())
+
+
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Comment)
+def decrement_post_counter(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Post):
+        return  # cascading from the post itself, nothing left to count
+    field = "like_count" if sender is Like else "comment_count"
+    counters.increment(instance.post_id, field, -1)
+
+
+@receiver(pre_save, sender=Post)
+def score_new_post(sender, instance, raw=False, **kwargs):
+    # new posts rank by recency right away; update_post_scores takes over from there
+    if instance._state.adding and not raw:
+        instance.score = ranking.hot_score(instance.like_count, instance.comment_count, timezone.now())
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    # here rather than in the API view so HTML and admin posts reach timelines too
+    if created and not raw:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def index_post_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def render_post_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule(instance, "image")
+
+
+@receiver(m2m_changed, sender=TaggedItem)
+def reindex_post_on_tag_change(sender, instance, action, **kwargs):
+    # taggit sends m2m_changed for tags.add/remove/set/clear
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if isinstance(instance, Post):
+        search.index_post(instance)
+        Post.objects.filter(pk=instance.pk).update(updated_at=Now())
+    elif isinstance(instance, Comment):
+        Comment.objects.filter(pk=instance.pk).update(updated_at=Now())
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_from_search(sender, instance, **kwargs):
+    search.remove_posts([instance.pk])
+
+
+@receiver(post_save, sender=TaggedItem)
+def count_tag_use(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        tags.record_tagged(instance)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def uncount_tag_use(sender, instance, **kwargs):
+    tags.record_untagged(instance)
@@ -0,0 +1,116 @@
+# posts/tags.py
+"""
+Tag helpers for taggit-tagged posts and comments.
+
+* ``prefetch_tag_names`` loads the tags of a whole page of objects with
+  one query (taggit's ``prefetch_related`` support) for ``obj.tags.all()``.
+* ``post_ids_for_tag`` is a ``pk__in`` subquery on TaggedItem's tag index,
+  used instead of taggit's generic join + DISTINCT; the database pages it.
+  Only the slug -> tag id lookup is cached.
+* TagCount / TagDailyCount are bumped incrementally from TaggedItem signals
+  (posts/signals.py), so tag clouds and trending tags read a handful of
+  counter rows instead of grouping over TaggedItem.
+
+Cache fills read the primary database, so a lagging replica is never
+cached for the whole TAG_CACHE_TIMEOUT.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, prefetch_related_objects
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from social_media_api.db_routers import PRIMARY
+from .models import Post, TagCount, TagDailyCount
+
+CACHE_TIMEOUT = getattr(settings, "TAG_CACHE_TIMEOUT", 5 * 60)
+
+
+def prefetch_tag_names(objects):
+    """Attach the tags of every object in ``objects`` using a single query."""
+    objects = list(objects)
+    prefetch_related_objects(objects, "tags")
+    return objects
+
+
+def _slug_key(slug):
+    return f"tags:slug:{slug}"
+
+
+def post_ids_for_tag(slug):
+    """Subquery of the ids of the posts tagged ``slug`` (use as ``pk__in``)."""
+    tag_id = cache.get(_slug_key(slug))
+    if tag_id is None:
+        tag_id = Tag.objects.using(PRIMARY).filter(slug=slug).values_list("id", flat=True).first()
+        if tag_id is not None:  # misses are not cached: the tag may be created any moment
+            cache.set(_slug_key(slug), tag_id, CACHE_TIMEOUT)
+    if tag_id is None:
+        return TaggedItem.objects.none().values("object_id")
+    return TaggedItem.objects.filter(
+        tag_id=tag_id, content_type=ContentType.objects.get_for_model(Post)
+    ).values("object_id")
+
+
+def _bump(model, lookup, delta):
+    """UPDATE counter = counter + delta, creating the row the first time."""
+    if model.objects.filter(**lookup).update(count=F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **lookup)
+    except IntegrityError:  # created concurrently
+        model.objects.filter(**lookup).update(count=F("count") + delta)
+
+
+def record_tagged(tagged_item):
+    _bump(TagCount, {"tag_id": tagged_item.tag_id}, 1)
+    _bump(TagDailyCount, {"tag_id": tagged_item.tag_id, "day": timezone.localdate()}, 1)
+
+
+def record_untagged(tagged_item):
+    TagCount.objects.filter(tag_id=tagged_item.tag_id, count__gt=0).update(count=F("count") - 1)
+
+
+def tag_cloud(limit=50):
+    """Most used tags with their usage counts."""
+    key = f"tags:cloud:{limit}"
+    cloud = cache.get(key)
+    if cloud is None:
+        cloud = [
+            {"name": name, "slug": slug, "count": count}
+            for name, slug, count in TagCount.objects.using(PRIMARY).filter(count__gt=0)
+            .order_by("-count", "tag__name")
+            .values_list("tag__name", "tag__slug", "count")[:limit]
+        ]
+        cache.set(key, cloud, CACHE_TIMEOUT)
+    return cloud
+
+
+def trending_tags(days=7, limit=20):
+    """Tags applied most often during the last ``days`` days."""
+    key = f"tags:trending:{days}:{limit}"
+    trending = cache.get(key)
+    if trending is None:
+        since = timezone.localdate() - timedelta(days=days - 1)
+        trending = [
+            {"name": row["tag__name"], "slug": row["tag__slug"], "count": row["total"]}
+            for row in TagDailyCount.objects.using(PRIMARY).filter(day__gte=since)
+            .values("tag__name", "tag__slug")
+            .annotate(total=Sum("count"))
+            .order_by("-total", "tag__name")[:limit]
+        ]
+        cache.set(key, trending, CACHE_TIMEOUT)
+    return trending
+
+
+def rebuild_counts():
+    """Recompute TagCount from TaggedItem (after bulk loads); returns the number of tags."""
+    totals = TaggedItem.objects.values("tag_id").annotate(total=Count("pk")).order_by()
+    with transaction.atomic():
+        TagCount.objects.all().delete()
+        TagCount.objects.bulk_create([TagCount(tag_id=row["tag_id"], count=row["total"]) for row in totals])
+    return TagCount.objects.count()
@@ -1,3 +1,951 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase, force_authenticate
+
+from accounts import follow_graph
+from accounts.authentication import CachedTokenAuthentication
+from accounts.models import CustomUser
+from django.core.cache import cache
+
+from notifications import dispatch
+from social_media_api import db_routers
+from . import images, importer, ranking, search, tags, timeline, views
+from .benchmark import EndpointBudgetMixin
+from .models import Comment, Like, Post, TimelineEntry
+from .pagination import encode_cursor
+from .views import ExportView, feed_async, post_detail_async
+
+# the ASGI routes of posts/urls.py (ASYNC_READ_VIEWS), for the async view tests
+urlpatterns = [
+    path("api/posts/<int:pk>/", post_detail_async, name="post-detail"),
+    path("api/", include("posts.urls")),
+]
+
+
+class PostEndpointBudgetTests(EndpointBudgetMixin, APITestCase):
+    """Query-count / latency budgets for the post, feed and like endpoints."""
+
+    def test_post_list(self):
+        def fetch():
+            response = self.client.get("/api/posts/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertWithinBudget("post_list", fetch)
+
+    def test_post_list_deep_page(self):
+        # walk a few cursor pages first so the measured page is far from the head
+        url = "/api/posts/"
+        for _ in range(20):
+            url = self.client.get(url).data["next"]
+
+        def fetch():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertWithinBudget("post_list_deep", fetch)
+
+    def test_feed(self):
+        def fetch():
+            response = self.client.get(reverse("feed"))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.data["results"])
+        self.assertWithinBudget("feed", fetch)
+
+    def test_like_and_unlike(self):
+        post_id = self.graph["post_ids"][-1]
+        like_url = reverse("like-post", args=[post_id])
+        unlike_url = reverse("unlike-post", args=[post_id])
+        self.client.post(unlike_url)  # start from a clean state
+
+        def like():
+            self.assertEqual(self.client.post(like_url).status_code, status.HTTP_201_CREATED)
+
+        def unlike():
+            self.assertEqual(self.client.post(unlike_url).status_code, status.HTTP_200_OK)
+
+        # each measured call is preceded by the untimed opposite action
+        self.assertWithinBudget("like", like, setup=lambda: self.client.post(unlike_url))
+        self.assertWithinBudget("unlike", unlike, setup=lambda: self.client.post(like_url))
+
+
+class TimelineTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="password123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="password123")
+        self.bob.following.add(self.alice)
+
+    def test_posts_created_outside_the_api_are_fanned_out(self):
+        post = Post.objects.create(title="From the form", content="c", author=self.alice)  # HTML view / admin path
+        self.assertTrue(TimelineEntry.objects.filter(user=self.bob, post=post).exists())
+
+    def test_timelines_are_trimmed(self):
+        for number in range(3):
+            Post.objects.create(title=f"Post {number}", content="c", author=self.alice)
+        self.assertEqual(timeline.trim_timeline(self.bob.pk, max_length=2), 1)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.bob).count(), 2)
+
+        out = io.StringIO()
+        call_command("rebuild_timelines", "--trim", stdout=out)
+        self.assertIn("Trimmed 1 timelines", out.getvalue())
+
+
+class CounterTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+        self.fan = CustomUser.objects.create_user(username="fan", password="password123")
+        self.post = Post.objects.create(title="counted", content="c", author=self.author)
+
+    def counts(self, post=None):
+        return Post.objects.values_list("like_count", "comment_count").get(pk=(post or self.post).pk)
+
+    def test_likes_and_comments_move_the_counters(self):
+        like = Like.objects.create(user=self.fan, post=self.post)
+        Like.objects.create(user=self.author, post=self.post)
+        comment = Comment.objects.create(post=self.post, author=self.fan, content="first")
+        self.assertEqual(self.counts(), (2, 1))
+
+        like.delete()
+        comment.delete()
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_post_delete_cascade_does_not_decrement(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        Comment.objects.create(post=self.post, author=self.fan, content="first")
+        with CaptureQueriesContext(connection) as queries:
+            self.post.delete()
+        self.assertFalse([query["sql"] for query in queries if query["sql"].startswith('UPDATE "posts_post"')])
+        self.assertFalse(Like.objects.exists() or Comment.objects.exists())
+
+    def test_user_delete_cascade_decrements_other_posts(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        Comment.objects.create(post=self.post, author=self.fan, content="first")
+        self.fan.delete()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_reconcile_fixes_drifted_rows(self):
+        other = Post.objects.create(title="other", content="c", author=self.author)
+        Like.objects.create(user=self.fan, post=self.post)
+        Comment.objects.create(post=other, author=self.fan, content="first")
+        Post.objects.filter(pk=self.post.pk).update(like_count=7, comment_count=3)
+
+        out = io.StringIO()
+        call_command("reconcile_post_counters", stdout=out)
+        self.assertIn("1 posts corrected", out.getvalue())
+        self.assertEqual(self.counts(), (1, 0))
+        self.assertEqual(self.counts(other), (0, 1))
+
+
+@override_settings(POST_COMMENT_PREVIEW_SIZE=3)
+class CommentPreviewTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+        self.posts = [Post.objects.create(title=f"Post {number}", author=self.author) for number in range(3)]
+
+    def comment(self, post, count):
+        created = [Comment.objects.create(post=post, author=self.author, content="c") for _ in range(count)]
+        # two comments share a timestamp: the id breaks the tie
+        Comment.objects.filter(pk=created[-1].pk).update(created_at=created[-2].created_at)
+        return created
+
+    def preview_ids(self, response):
+        return {post["id"]: [comment["id"] for comment in post["comments"]] for post in response.data["results"]}
+
+    def test_comments_hold_the_newest_in_order(self):
+        newest = {post.pk: [comment.pk for comment in self.comment(post, 5)][::-1][:3] for post in self.posts}
+        self.assertEqual(self.preview_ids(self.client.get(reverse("post-list"))), newest)
+        for post in self.posts:
+            response = self.client.get(reverse("post-detail", args=[post.pk]))
+            self.assertEqual([comment["id"] for comment in response.data["comments"]], newest[post.pk])
+
+    def test_query_count_is_flat_as_comments_grow(self):
+        def list_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(reverse("post-list")).status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        for post in self.posts:
+            self.comment(post, 2)
+        few = list_queries()
+        for post in self.posts:
+            self.comment(post, 20)
+        self.assertEqual(list_queries(), few)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username="alice", password="password123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="password123")
+        self.bob.following.add(self.alice)
+        posts = [Post.objects.create(title=f"Post {number}", content="c", author=self.alice) for number in range(7)]
+        # posts 1-4 share a timestamp: only the id breaks the tie
+        tied = [post.pk for post in posts[1:5]]
+        Post.objects.filter(pk__in=tied).update(published_date=posts[1].published_date)
+        TimelineEntry.objects.filter(post_id__in=tied).update(published_date=posts[1].published_date)
+        self.newest_first = list(Post.objects.order_by("-published_date", "-id").values_list("id", flat=True))
+        self.client.force_authenticate(self.bob)
+
+    def walk(self, url, link="next"):
+        """Follow ``link`` from ``url`` to the end; returns the ids of every page and the last response."""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([post["id"] for post in response.data["results"]])
+            url = response.data[link]
+        return pages, response
+
+    def check_walk(self, url):
+        pages, last = self.walk(f"{url}?page_size=2")
+        self.assertEqual([post_id for page in pages for post_id in page], self.newest_first)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        back, _ = self.walk(last.data["previous"], link="previous")
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_cursor_walk_has_no_duplicates_or_gaps_on_ties(self):
+        self.check_walk(reverse("post-list"))
+
+    def test_feed_cursor_walk_has_no_duplicates_or_gaps_on_ties(self):
+        self.check_walk(reverse("feed"))
+
+    def test_invalid_cursors_are_not_found(self):
+        next_page = self.client.get(reverse("post-list"), {"page_size": 2}).data["next"]
+        valid = parse_qs(urlsplit(next_page).query)["cursor"][0]
+        for cursor in ("garbage", valid[:-3], encode_cursor(["not a date", "1"]), encode_cursor(["1"])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse("post-list"), {"cursor": cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_ordering_and_search_fall_back_to_page_numbers(self):
+        url = reverse("post-list")
+        for params in ({"page": 2}, {"ordering": "title"}, {"search": "Post"}):
+            with self.subTest(params=params):
+                response = self.client.get(url, {"page_size": 2, **params})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data["count"], 7)
+                self.assertEqual(len(response.data["results"]), 2)
+        titles = [post["title"] for post in self.client.get(url, {"ordering": "-title"}).data["results"]]
+        self.assertEqual(titles, sorted(titles, reverse=True))
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        author = CustomUser.objects.create_user(username="author", password="password123")
+        self.django = Post.objects.create(title="Django tips", content="middleware and signals", author=author)
+        self.python = Post.objects.create(title="Weekend notes", content="python packaging and django", author=author)
+        self.other = Post.objects.create(title="Cooking", content="pasta", author=author)
+        self.other.tags.add("djangocon")
+
+    def check_backend(self, backend):
+        backend.clear()
+        for post in Post.objects.all():
+            backend.index(post)
+        # title hits outrank content hits; prefixes match tags too
+        self.assertEqual(backend.search("django")[:2], [self.django.pk, self.other.pk])
+        self.assertEqual(set(backend.search("djan")), {self.django.pk, self.python.pk, self.other.pk})
+        # every token has to match
+        self.assertEqual(backend.search("django pack"), [self.python.pk])
+        self.assertEqual(backend.search("?!"), [])
+        backend.remove([self.django.pk])
+        self.assertNotIn(self.django.pk, backend.search("django"))
+
+    def test_inverted_index_backend(self):
+        self.check_backend(search.InvertedIndexBackend())
+
+    def test_inverted_index_matches_term_prefixes_only(self):
+        backend = search.InvertedIndexBackend()
+        for post in Post.objects.all():
+            backend.index(post)
+        self.assertEqual(backend.search("middlew"), [self.django.pk])
+        self.assertEqual(backend.search("packag djang"), [self.python.pk])
+        self.assertEqual(backend.search("iddleware"), [])  # inside a term, not a prefix
+        self.assertEqual(backend.search("midd_eware"), [])  # "_" is literal, not a LIKE wildcard
+
+    def test_default_backend(self):
+        self.check_backend(search.get_backend())
+
+    def test_signals_keep_index_current(self):
+        self.python.title = "Renamed"
+        self.python.save()
+        self.assertIn(self.python.pk, search.search_ids("renamed"))
+        self.python.tags.add("asyncio")
+        self.assertEqual(search.search_ids("asyncio"), [self.python.pk])
+        self.python.delete()
+        self.assertEqual(search.search_ids("asyncio"), [])
+
+    def test_api_and_html_search(self):
+        response = self.client.get("/api/posts/", {"search": "django"})
+        self.assertEqual([post["id"] for post in response.data["results"]][0], self.django.pk)
+        self.assertEqual(response.data["count"], 3)
+        response = self.client.get(reverse("post-search"), {"q": "pasta"})
+        self.assertEqual(list(response.context["results"]), [self.other])
+
+
+class TagTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        author = CustomUser.objects.create_user(username="author", password="password123")
+        self.first = Post.objects.create(title="first", author=author)
+        self.second = Post.objects.create(title="second", author=author)
+        self.first.tags.add("django", "python")
+        self.second.tags.add("django")
+
+    def test_counters_follow_tagging(self):
+        self.assertEqual(tags.tag_cloud()[0], {"name": "django", "slug": "django", "count": 2})
+        self.second.tags.remove("django")
+        cache.clear()
+        self.assertEqual([(t["name"], t["count"]) for t in tags.tag_cloud()], [("django", 1), ("python", 1)])
+        self.assertEqual(self.client.get(reverse("tag-trending")).data[0]["name"], "django")
+
+    def test_posts_by_tag_follow_tagging(self):
+        def tagged(slug):
+            return sorted(row["object_id"] for row in tags.post_ids_for_tag(slug))
+
+        self.assertEqual(tagged("django"), [self.first.pk, self.second.pk])
+        self.second.tags.clear()
+        self.assertEqual(tagged("django"), [self.first.pk])
+        response = self.client.get(reverse("posts-by-tag", args=["django"]))
+        self.assertEqual([post["id"] for post in response.data["results"]], [self.first.pk])
+
+        self.assertEqual(tagged("rust"), [])  # unknown slugs are not cached...
+        self.second.tags.add("rust")
+        self.assertEqual(tagged("rust"), [self.second.pk])  # ...so a new tag shows up at once
+
+    def test_prefetch_tag_names(self):
+        posts = list(Post.objects.order_by("pk"))
+        with self.assertNumQueries(1):
+            tags.prefetch_tag_names(posts)
+        with self.assertNumQueries(0):
+            self.assertEqual([[t.name for t in post.tags.all()] for post in posts], [["django", "python"], ["django"]])
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+
+    def _upload(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90 degrees
+        exif[0x010F] = "camera"
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 600), "red").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def test_variants_are_rotated_resized_and_stripped(self):
+        post = Post.objects.create(title="photo", author=self.author, image=self._upload())
+        self.assertTrue(images.needs_variants(post, "image"))
+        variants = images.generate_variants(post, "image")
+        self.assertEqual(variants["source"], post.image.name)
+        with post.image.storage.open(variants["thumbnail"]) as fh:
+            thumbnail = Image.open(fh)
+            self.assertEqual(thumbnail.format, "WEBP")
+            self.assertEqual(thumbnail.size, (75, 150))
+            self.assertFalse(thumbnail.getexif())
+        post.refresh_from_db()
+        self.assertFalse(images.needs_variants(post, "image"))
+        data = self.client.get(reverse("post-detail", args=[post.pk])).data
+        self.assertTrue(data["image_medium"].endswith("_medium.webp"))
+
+    def test_default_image_is_skipped(self):
+        post = Post.objects.create(title="plain", author=self.author)
+        self.assertFalse(images.needs_variants(post, "image"))
+        self.assertIsNone(self.client.get(reverse("post-detail", args=[post.pk])).data["image_thumbnail"])
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+        self.post = Post.objects.create(title="first", author=self.author)
+
+    def test_detail_not_modified_until_the_post_changes(self):
+        url = reverse("post-detail", args=[self.post.pk])
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        Like.objects.create(user=self.author, post=self.post)  # like_count is in the payload
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["like_count"], 1)
+
+    def test_detail_etag_depends_on_the_field_selection(self):
+        url = reverse("post-detail", args=[self.post.pk])
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, {"fields": "title"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {"id", "title"})
+        sparse = response["ETag"]
+        self.assertNotEqual(sparse, self.client.get(url, {"omit": "title"})["ETag"])
+        response = self.client.get(url, {"fields": "title,title"}, HTTP_IF_NONE_MATCH=sparse)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_tracks_edits_and_deletions(self):
+        url = reverse("post-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        second = Post.objects.create(title="second", author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        second.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+        self.assertNotEqual(self.client.get(url, {"author__username": "author"})["ETag"], self.client.get(url)["ETag"])
+
+    def test_comment_validators_track_the_post_and_comment_tags(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content="c")
+        detail, listing = reverse("comment-detail", args=[comment.pk]), reverse("comment-list")
+        etags = {url: self.client.get(url)["ETag"] for url in (detail, listing)}
+
+        def assert_modified():
+            for url, etag in etags.items():
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+                etags[url] = response["ETag"]
+            return response
+
+        Post.objects.filter(pk=self.post.pk).update(title="renamed", updated_at=timezone.now())
+        assert_modified()
+        comment.tags.add("news")
+        response = assert_modified()
+        self.assertEqual(response.data["results"][0]["tags"], ["news"])
+        self.assertEqual(response.data["results"][0]["post_title"], "renamed")
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = CustomUser.objects.create_user(username="viewer", password="password123")
+        author = CustomUser.objects.create_user(username="author", password="password123")
+        self.posts = [Post.objects.create(title=f"post {i}", author=author) for i in range(3)]
+        self.posts[0].tags.add("django")
+        self.viewer.following.add(author)
+        self.token = Token.objects.create(user=self.viewer)
+        self.headers = {"Authorization": f"Token {self.token.key}"}
+        self.factory = AsyncRequestFactory()
+
+    async def test_feed_matches_sync_feed(self):
+        response = await feed_async(self.factory.get("/", {"page_size": 2}, headers=self.headers))
+        data = json.loads(response.content)
+        self.assertEqual([post["id"] for post in data["results"]], [self.posts[2].pk, self.posts[1].pk])
+        self.assertIsNotNone(data["next"])
+        response = await feed_async(self.factory.get("/"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_post_detail_and_conditional_get(self):
+        response = await post_detail_async(self.factory.get("/", headers=self.headers), pk=self.posts[0].pk)
+        self.assertEqual(json.loads(response.content)["tags"], ["django"])
+        request = self.factory.get("/", headers={**self.headers, "If-None-Match": response["ETag"]})
+        response = await post_detail_async(request, pk=self.posts[0].pk)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = await post_detail_async(self.factory.get("/"), pk=0)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_post_detail_writes_pass_csrf_under_asgi(self):
+        author_token = await Token.objects.acreate(user=await CustomUser.objects.aget(username="author"))
+        client = AsyncClient(enforce_csrf_checks=True)
+        headers = {"Authorization": f"Token {author_token.key}"}
+        with override_settings(ROOT_URLCONF=__name__):  # the ASYNC_READ_VIEWS route
+            url = f"/api/posts/{self.posts[1].pk}/"
+            response = await client.patch(url, {"title": "edited"}, content_type="application/json", headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(json.loads(response.content)["title"], "edited")
+            response = await client.delete(url, headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await Post.objects.filter(pk=self.posts[1].pk).aexists())
+
+
+class LikeStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = CustomUser.objects.create_user(username="viewer", password="password123")
+        author = CustomUser.objects.create_user(username="author", password="password123")
+        self.posts = [Post.objects.create(title=f"post {i}", author=author) for i in range(3)]
+        Like.objects.create(user=self.viewer, post=self.posts[0])
+        self.client.force_authenticate(self.viewer)
+
+    def test_liked_by_me_is_annotated(self):
+        response = self.client.get(reverse("post-list"))
+        liked = {post["id"]: post["liked_by_me"] for post in response.data["results"]}
+        self.assertEqual(liked, {self.posts[0].pk: True, self.posts[1].pk: False, self.posts[2].pk: False})
+        self.client.force_authenticate(None)
+        response = self.client.get(reverse("post-detail", args=[self.posts[0].pk]))
+        self.assertFalse(response.data["liked_by_me"])
+
+    def test_bulk_like_and_unlike(self):
+        ids = [post.pk for post in self.posts] + [999999]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("bulk-like"), {"action": "like", "post_ids": ids}, format="json")
+        self.assertEqual(response.data["changed"], [self.posts[1].pk, self.posts[2].pk])
+        self.assertEqual(response.data["not_found"], [999999])
+        self.assertEqual(list(Post.objects.order_by("pk").values_list("like_count", flat=True)), [1, 1, 1])
+        self.assertEqual(dispatch.flush(), 2)
+
+        with self.assertNumQueries(6):  # savepoint, posts, likes, delete, counters, release
+            response = self.client.post(reverse("bulk-like"), {"action": "unlike", "post_ids": ids}, format="json")
+        self.assertEqual(len(response.data["changed"]), 3)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(list(Post.objects.values_list("like_count", flat=True)), [0, 0, 0])
+
+    def test_bulk_like_racing_a_single_like(self):
+        insert_likes = views._insert_likes
+
+        def liked_meanwhile(user, post_ids, liked):
+            Like.objects.create(user=self.viewer, post=self.posts[1])  # counter incremented by the signal
+            return insert_likes(user, post_ids, liked)
+
+        ids = [post.pk for post in self.posts]
+        with mock.patch.object(views, "_insert_likes", liked_meanwhile), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("bulk-like"), {"action": "like", "post_ids": ids}, format="json")
+        self.assertEqual(response.data["changed"], [self.posts[2].pk])
+        self.assertEqual(list(Post.objects.order_by("pk").values_list("like_count", flat=True)), [1, 1, 1])
+        self.assertEqual(dispatch.flush(), 1)  # no notification for the like this request did not insert
+
+    def test_bulk_unlike_racing_a_single_unlike(self):
+        Like.objects.create(user=CustomUser.objects.get(username="author"), post=self.posts[0])  # like_count 2
+        delete_likes = views._delete_likes
+
+        def unliked_meanwhile(user, post_ids):
+            Like.objects.filter(user=self.viewer).delete()  # counter decremented by the signal
+            return delete_likes(user, post_ids)
+
+        with mock.patch.object(views, "_delete_likes", unliked_meanwhile):
+            response = self.client.post(
+                reverse("bulk-like"), {"action": "unlike", "post_ids": [self.posts[0].pk]}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).like_count, 1)
+
+    def test_bulk_rejects_too_many_ids(self):
+        response = self.client.post(
+            reverse("bulk-like"), {"action": "like", "post_ids": list(range(1, 102))}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RankingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = CustomUser.objects.create_user(username="viewer", password="password123")
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+        self.posts = [Post.objects.create(title=f"post {i}", author=self.author) for i in range(3)]
+        self.viewer.following.add(self.author)
+        self.client.force_authenticate(self.viewer)
+        settle = mock.patch.object(ranking, "SETTLE", timedelta(0))
+        settle.start()
+        self.addCleanup(settle.stop)
+
+    def test_score_combines_engagement_and_recency(self):
+        now = timezone.now()
+        self.assertGreater(ranking.hot_score(10, 0, now), ranking.hot_score(1, 0, now))
+        self.assertGreater(ranking.hot_score(0, 5, now), ranking.hot_score(5, 0, now))
+        self.assertGreater(ranking.hot_score(1, 0, now), ranking.hot_score(1, 0, now - timedelta(days=1)))
+
+    def test_job_only_rescores_touched_posts(self):
+        self.assertEqual(ranking.update_scores(), 3)
+        self.assertEqual(ranking.update_scores(), 0)
+        before = Post.objects.get(pk=self.posts[0].pk).score
+        Like.objects.create(user=self.viewer, post=self.posts[0])
+        self.assertEqual(ranking.update_scores(), 1)
+        self.assertGreater(Post.objects.get(pk=self.posts[0].pk).score, before)
+
+    def test_top_feed_orders_by_score(self):
+        for user_number in range(3):
+            fan = CustomUser.objects.create_user(username=f"fan{user_number}", password="password123")
+            Like.objects.create(user=fan, post=self.posts[0])
+        ranking.update_scores()
+        response = self.client.get(reverse("feed"), {"ranking": "top", "page_size": 2})
+        self.assertEqual([post["id"] for post in response.data["results"]], [self.posts[0].pk, self.posts[2].pk])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([post["id"] for post in response.data["results"]], [self.posts[1].pk])
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = CustomUser.objects.create_user(username="viewer", password="password123")
+        author = CustomUser.objects.create_user(username="author", password="password123")
+        self.posts = [Post.objects.create(title=f"post {i}", content="long text", author=author) for i in range(3)]
+        for post in self.posts:
+            post.tags.add("django")
+            Comment.objects.create(post=post, author=self.viewer, content="hi")
+        self.viewer.following.add(author)
+        self.client.force_authenticate(self.viewer)
+
+    def test_fields_prune_keys_and_database_work(self):
+        url = reverse("post-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"fields": "title,author_username", "page_size": 2})
+        self.assertEqual(list(response.data["results"][0]), ["id", "title", "author_username"])
+        # ETag aggregate + one page query: no tag or comment-preview prefetches
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"posts_post"."content"', queries[1]["sql"])
+        self.assertNotIn("posts_like", queries[1]["sql"])
+
+        # cursor positions still work with the trimmed rows
+        response = self.client.get(response.data["next"])
+        self.assertEqual([post["id"] for post in response.data["results"]], [self.posts[0].pk])
+
+    def test_omit_comments_and_user_and_comment_serializers(self):
+        response = self.client.get(reverse("feed"), {"omit": "comments,tags,content"})
+        self.assertNotIn("comments", response.data["results"][0])
+        self.assertEqual(response.data["results"][0]["like_count"], 0)
+
+        response = self.client.get(reverse("post-comments", args=[self.posts[0].pk]), {"fields": "content"})
+        self.assertEqual(response.data["results"], [{"id": self.posts[0].comments.get().pk, "content": "hi"}])
+        response = self.client.get(reverse("user-list"), {"fields": "username"})
+        self.assertEqual(set(response.data["results"][0]), {"id", "username"})
+
+    def test_unknown_fields_are_rejected_and_writes_ignore_the_selection(self):
+        response = self.client.get(reverse("post-list"), {"fields": "title,password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["fields"], ["Unknown field: password"])
+        response = self.client.post(f"{reverse('post-list')}?fields=id", {"title": "new", "content": "body"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Post.objects.get(pk=response.data["id"]).content, "body")
+
+    async def test_async_feed_honours_fields(self):
+        token = await Token.objects.acreate(user=self.viewer)
+        request = AsyncRequestFactory().get("/", {"fields": "title"}, headers={"Authorization": f"Token {token.key}"})
+        data = json.loads((await feed_async(request)).content)
+        self.assertEqual(data["results"][0], {"id": self.posts[2].pk, "title": "post 2"})
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="password123")
+        self.posts = [Post.objects.create(title=f"post {i}", author=self.author) for i in range(5)]
+        self.posts[0].tags.add("django", "api")
+        Comment.objects.create(post=self.posts[0], author=self.author, content="first!")
+
+    def read(self, raw):
+        return [json.loads(line) for line in raw.decode().splitlines()]
+
+    def test_command_writes_gzipped_ndjson_in_batches(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f"{directory}/dump.ndjson.gz"
+        out = io.StringIO()
+        call_command("export_posts", "--output", path, "--gzip", "--batch-size=2", stdout=out)
+        self.assertIn("Exported 6 rows", out.getvalue())
+        with gzip.open(path) as dump:
+            rows = self.read(dump.read())
+        self.assertEqual([row["id"] for row in rows if row["type"] == "post"], [post.pk for post in self.posts])
+        self.assertEqual(rows[0]["tags"], ["api", "django"])
+        self.assertEqual(rows[0]["author"], "author")
+        self.assertEqual(rows[-1]["type"], "comment")
+        self.assertEqual(rows[-1]["content"], "first!")
+
+    def test_endpoint_streams_for_staff_only(self):
+        url = reverse("export")
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        staff = CustomUser.objects.create_user(username="staff", password="password123", is_staff=True)
+        self.client.force_authenticate(staff)
+        response = self.client.get(url, {"types": "comments"})
+        self.assertTrue(response.streaming)
+        rows = self.read(b"".join(response.streaming_content))
+        self.assertEqual([(row["type"], row["post_id"]) for row in rows], [("comment", self.posts[0].pk)])
+
+        response = self.client.get(url, {"gzip": "1"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(len(self.read(gzip.decompress(b"".join(response.streaming_content)))), 6)
+        self.assertEqual(self.client.get(url, {"types": "likes"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_endpoint_streams_asynchronously_under_asgi(self):
+        staff = CustomUser.objects.create_user(username="staff", password="password123", is_staff=True)
+        request = AsyncRequestFactory().get("/api/export/", {"types": "posts"})
+        force_authenticate(request, staff)
+        response = ExportView.as_view()(request)
+        self.assertTrue(response.is_async)  # not collected into a list before sending
+
+        async def consume():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(len(self.read(async_to_sync(consume)())), 5)
+
+
+class ImportTests(APITestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username="alice", password="password123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="password123")
+        self.existing = Post.objects.create(title="existing", author=self.alice)
+        Like.objects.create(user=self.bob, post=self.existing)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = f"{self.directory}/{name}"
+        with open(path, "w") as handle:
+            handle.write(text)
+        return path
+
+    def ndjson(self, rows):
+        return self.write("data.ndjson", "".join(json.dumps(row) + "\n" for row in rows))
+
+    def test_ndjson_rows_are_bulk_created_with_tags_and_counters(self):
+        path = self.ndjson([
+            {"type": "post", "id": 900, "title": "imported", "author": "alice",
+             "published_date": "2025-01-02T03:04:05Z", "tags": ["django", "bulk"]},
+            {"type": "comment", "post_id": 900, "author": "bob", "content": "nice", "tags": ["django"]},
+            {"type": "comment", "post_id": 900, "author": "alice", "content": "thanks"},
+            {"type": "like", "post_id": 900, "user": "bob"},
+            {"type": "like", "post_id": self.existing.pk, "user": "bob"},  # already liked
+            {"type": "post", "title": "ghost", "author": "nobody"},
+        ])
+        stats = importer.import_file(path, chunk_size=4)
+        self.assertEqual(stats.created, {"post": 1, "comment": 2, "like": 1})  # bob's existing like is skipped
+        self.assertEqual(stats.rejected, [(6, "unknown user 'nobody'")])
+
+        post = Post.objects.get(pk=900)
+        self.assertEqual(post.published_date.isoformat(), "2025-01-02T03:04:05+00:00")
+        self.assertEqual((post.comment_count, post.like_count), (2, 1))
+        self.assertEqual(sorted(post.tags.names()), ["bulk", "django"])
+        self.assertEqual(list(post.comments.get(content="nice").tags.names()), ["django"])
+        self.assertEqual(Post.objects.get(pk=self.existing.pk).like_count, 1)
+
+    def test_rows_for_unknown_posts_are_rejected_not_fatal(self):
+        path = self.ndjson([
+            {"type": "post", "title": "valid", "author": "alice"},
+            {"type": "comment", "post_id": 99999, "author": "bob", "content": "orphan"},
+            {"type": "like", "post_id": 99999, "user": "bob"},
+            {"type": "comment", "post_id": "x", "author": "bob", "content": "bad id"},
+            {"type": "comment", "post_id": self.existing.pk, "author": "bob", "content": "fine"},
+        ])
+        stats = importer.import_file(path)
+        self.assertEqual(stats.rejected, [(2, "unknown post 99999"), (3, "unknown post 99999"), (4, "missing post_id")])
+        self.assertEqual(stats.created, {"post": 1, "comment": 1, "like": 0})
+        self.assertTrue(Post.objects.filter(title="valid").exists())
+
+    def test_taken_ids_are_rejected_not_fatal(self):
+        comment = Comment.objects.create(post=self.existing, author=self.bob, content="existing")
+        path = self.ndjson([
+            {"type": "post", "id": self.existing.pk, "title": "collides", "author": "alice"},
+            {"type": "post", "id": 900, "title": "new", "author": "alice"},
+            {"type": "post", "id": 900, "title": "repeated", "author": "alice"},
+            {"type": "post", "id": "x", "title": "bad id", "author": "alice"},
+            {"type": "comment", "id": comment.pk, "post_id": 900, "author": "bob", "content": "collides"},
+            {"type": "comment", "id": 901, "post_id": 900, "author": "bob", "content": "new"},
+        ])
+        stats = importer.import_file(path)
+        self.assertEqual(stats.rejected, [
+            (1, f"post {self.existing.pk} already exists"), (3, "post 900 already exists"),
+            (4, "invalid id 'x'"), (5, f"comment {comment.pk} already exists"),
+        ])
+        self.assertEqual(stats.created, {"post": 1, "comment": 1, "like": 0})
+        self.assertEqual(Post.objects.get(pk=self.existing.pk).title, "existing")
+        self.assertEqual(Post.objects.get(pk=900).comment_count, 1)
+
+    def test_interrupted_import_resumes_after_the_last_chunk(self):
+        path = self.ndjson([{"type": "post", "title": f"post {i}", "author": "alice"} for i in range(5)])
+        real_chunk = importer.import_chunk
+        calls = []
+
+        def failing_chunk(rows, first_line, stats):
+            calls.append(first_line)
+            if len(calls) == 2:
+                raise RuntimeError("killed")
+            real_chunk(rows, first_line, stats)
+
+        with mock.patch.object(importer, "import_chunk", failing_chunk), self.assertRaises(RuntimeError):
+            importer.import_file(path, chunk_size=2)
+        self.assertEqual(Post.objects.filter(title__startswith="post ").count(), 2)
+
+        stats = importer.import_file(path, chunk_size=2)
+        self.assertEqual((stats.resumed_at, stats.created["post"]), (2, 3))
+        self.assertEqual(Post.objects.filter(title__startswith="post ").count(), 5)
+
+    def test_command_reads_csv(self):
+        path = self.write("posts.csv", 'title,content,author,tags\nfrom csv,body,bob,"csv, import"\n')
+        out = io.StringIO()
+        call_command("import_posts", path, "--type=post", stdout=out)
+        self.assertIn("Imported 1 posts, 0 comments, 0 likes", out.getvalue())
+        self.assertEqual(sorted(Post.objects.get(title="from csv").tags.names()), ["csv", "import"])
+
+
+@skipUnless(connection.vendor == "sqlite", "reads SQLite's EXPLAIN QUERY PLAN output")
+class QueryPlanTests(EndpointBudgetMixin, APITestCase):
+    """Every SELECT behind the hot endpoints must be served by an index on the seeded data."""
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_post_reads(self):
+        post_id = self.graph["post_ids"][len(self.graph["post_ids"]) // 2]
+        next_page = self.get("/api/posts/").data["next"]
+        self.assertUsesIndexes("post_list", lambda: self.get("/api/posts/"))
+        self.assertUsesIndexes("post_list_deep", lambda: self.get(next_page))
+        self.assertUsesIndexes("post_detail", lambda: self.get(reverse("post-detail", args=[post_id])))
+        self.assertUsesIndexes("post_comments", lambda: self.get(reverse("post-comments", args=[post_id])))
+
+    def test_feed(self):
+        self.assertUsesIndexes("feed", lambda: self.get(reverse("feed")))
+        # a top-N sort of at most TIMELINE_MAX_LENGTH entries: the scores change too often to index per timeline
+        self.assertUsesIndexes("feed_top", lambda: self.get(reverse("feed"), {"ranking": "top"}), allow_sorts=True)
+
+    def test_feed_is_read_in_timeline_index_order(self):
+        viewer = self.graph["viewer"]
+        page = timeline.timeline_posts(viewer).for_api(viewer)[:11]
+        sql, params = page.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(any("timeline_user_date_idx" in step for step in plan), plan)
+        self.assertFalse([step for step in plan if "TEMP B-TREE" in step], plan)
+
+    def test_notifications(self):
+        self.assertUsesIndexes("notifications", lambda: self.get(reverse("notifications")))
+        self.assertUsesIndexes("unread_count", lambda: self.get(reverse("notifications-unread-count")))
+
+
+@mock.patch.object(db_routers, "REPLICAS", ["replica"])
+class ReadReplicaRoutingTests(SimpleTestCase):
+    """
+    Routing decisions only, outside TestCase's transaction (reads inside an
+    atomic block stay on the primary); the test settings have no replica.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def route(self, request, write=False):
+        seen = []
+
+        def view(request):
+            seen.append(Post.objects.all().db)
+            if write:
+                router.db_for_write(Post)
+                seen.append(Post.objects.all().db)
+            return HttpResponse()
+
+        response = db_routers.ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_api_reads_use_a_replica_until_the_request_writes(self):
+        seen, response = self.route(self.factory.get("/api/posts/"))
+        self.assertEqual(seen, ["replica"])
+        self.assertNotIn(db_routers.PIN_COOKIE, response.cookies)
+
+        seen, response = self.route(self.factory.get("/api/posts/"), write=True)
+        self.assertEqual(seen, ["replica", "default"])
+        self.assertIn(db_routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(Post.objects.all().db, "default")  # nothing leaks past the request
+
+    def test_writes_pinned_clients_and_other_paths_use_the_primary(self):
+        seen, response = self.route(self.factory.post("/api/posts/"))
+        self.assertEqual(seen, ["default"])
+        self.assertEqual(response.cookies[db_routers.PIN_COOKIE]["max-age"], db_routers.PIN_SECONDS)
+
+        request = self.factory.get("/api/posts/")
+        request.COOKIES[db_routers.PIN_COOKIE] = "1"
+        self.assertEqual(self.route(request)[0], ["default"])
+        self.assertEqual(self.route(self.factory.get("/admin/"))[0], ["default"])
+
+    async def test_async_views_inherit_the_routing(self):
+        async def view(request):
+            return HttpResponse(await sync_to_async(lambda: Post.objects.all().db)())
+
+        middleware = db_routers.ReplicaRoutingMiddleware(view)
+        response = await middleware(AsyncRequestFactory().get("/api/feed/"))
+        self.assertEqual(response.content, b"replica")
+
+
+@skipUnless(connection.vendor == "sqlite", "replicates with SQLite's online backup API")
+@mock.patch.object(db_routers, "REPLICAS", ["replica_copy"])
+class SecondDatabaseReplicaTests(TransactionTestCase):
+    """
+    A real second SQLite database as the replica: a copy of the primary
+    taken with the backup API, lagging behind every later write.
+    """
+
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        primary = connections["default"]
+        # a connection outside settings.DATABASES: the test runner neither creates nor flushes it
+        connections["replica_copy"] = type(primary)({**primary.settings_dict, "NAME": ":memory:"}, "replica_copy")
+        self.addCleanup(connections.__delitem__, "replica_copy")
+        self.addCleanup(connections["replica_copy"].close)
+
+    def replicate(self):
+        connections["default"].ensure_connection()
+        connections["replica_copy"].ensure_connection()
+        connections["default"].connection.backup(connections["replica_copy"].connection)
+
+    def titles(self):
+        response = self.client.get(reverse("post-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {post["title"] for post in response.data["results"]}
+
+    def test_writes_go_to_the_primary_and_reads_to_the_replica(self):
+        author = CustomUser.objects.create_user(username="author", password="password123")
+        Post.objects.create(title="replicated", author=author)
+        self.replicate()
+        Post.objects.create(title="lagging", author=author)
+
+        self.assertEqual(self.titles(), {"replicated"})  # read from the copy
+        self.assertEqual(Post.objects.using("replica_copy").count(), 1)
+
+        self.client.force_authenticate(author)
+        response = self.client.post(reverse("post-list"), {"title": "written", "content": "c"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Post.objects.using("replica_copy").filter(title="written").exists())
+        # the write pinned this client to the primary
+        self.assertEqual(self.titles(), {"replicated", "lagging", "written"})
+
+
+class CacheFillRoutingTests(APITestCase):
+    """Cache-filling reads go to the primary even while the request reads from a replica."""
+
+    def test_cache_fills_read_the_primary(self):
+        cache.clear()
+        user = CustomUser.objects.create_user(username="alice", password="password123")
+        token = Token.objects.create(user=user)
+        Post.objects.create(title="tagged", author=user).tags.add("django")
+        # "replica" is not a configured database: a cache fill routed there would raise
+        # (content types are immutable, their in-process cache may read a replica)
+        def db_for_read(router, model, **hints):
+            return "default" if model is ContentType else "replica"
+
+        with mock.patch.object(db_routers.PrimaryReplicaRouter, "db_for_read", db_for_read), \
+                override_settings(AUTH_TOKEN_CACHE_TIMEOUT=300):
+            self.assertEqual(follow_graph.following_ids(user.pk), frozenset())
+            self.assertEqual(tags.tag_cloud()[0]["name"], "django")
+            tags.post_ids_for_tag("django")
+            self.assertEqual(tags.trending_tags()[0]["name"], "django")
+            self.assertEqual(CachedTokenAuthentication().authenticate_credentials(token.key)[0], user)
+            self.assertEqual(CachedTokenAuthentication().authenticate_credentials(token.key)[0], user)  # cached
@@ -0,0 +1,98 @@
+# posts/timeline.py
+"""
+Materialized home timelines (fan-out on write).
+
+Every user has a list of TimelineEntry rows pointing at the posts of the
+accounts they follow. Rows are written when a post is created, removed when
+the post is deleted (FK cascade) or the author is unfollowed, and the feed
+only reads the rows for one user instead of joining over the follow table.
+
+Fan-out runs from the Post post_save signal, so every way of creating a
+post (API, HTML form, admin) reaches the timelines. Fan-out only appends;
+``manage.py rebuild_timelines --trim`` (run periodically) cuts timelines
+back to TIMELINE_MAX_LENGTH entries, and backfills trim as they go.
+"""
+from django.conf import settings
+from django.db.models import F, Q
+
+from accounts import follow_graph
+from .models import Post, TimelineEntry
+
+TIMELINE_MAX_LENGTH = getattr(settings, "TIMELINE_MAX_LENGTH", 800)
+TIMELINE_BACKFILL = getattr(settings, "TIMELINE_BACKFILL", 50)
+BATCH_SIZE = 1000
+
+
+def fan_out_post(post):
+    """Push a freshly created post into the timeline of every follower."""
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post.pk, published_date=post.published_date)
+        for user_id in follow_graph.follower_ids(post.author_id)
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def backfill_author(user_id, author_id, limit=TIMELINE_BACKFILL):
+    """Copy the latest posts of a newly followed author into a timeline."""
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by("-published_date", "-id")
+        .values_list("id", "published_date")[:limit]
+    )
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, published_date=published_date)
+        for post_id, published_date in posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    trim_timeline(user_id)
+
+
+def remove_author(user_ids, author_ids):
+    """Drop the posts of ``author_ids`` from the timelines of ``user_ids``."""
+    TimelineEntry.objects.filter(user_id__in=user_ids, post__author_id__in=author_ids).delete()
+
+
+def trim_timeline(user_id, max_length=TIMELINE_MAX_LENGTH):
+    """Keep only the newest ``max_length`` entries of a timeline; returns the number removed."""
+    entries = TimelineEntry.objects.filter(user_id=user_id)
+    newest_first = entries.order_by("-published_date", "-post_id").values_list("published_date", "post_id")
+    first_dropped = list(newest_first[max_length:max_length + 1])
+    if not first_dropped:
+        return 0
+    published_date, post_id = first_dropped[0]
+    removed, _ = entries.filter(
+        Q(published_date__lt=published_date) | Q(published_date=published_date, post_id__lte=post_id)
+    ).delete()
+    return removed
+
+
+def rebuild_timeline(user_id, max_length=TIMELINE_MAX_LENGTH):
+    """Recompute a timeline from scratch (cold users, repairs)."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = (
+        Post.objects.filter(author_id__in=follow_graph.following_ids(user_id))
+        .order_by("-published_date", "-id")
+        .values_list("id", "published_date")[:max_length]
+    )
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, published_date=published_date)
+        for post_id, published_date in posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def timeline_posts(user):
+    """
+    Posts of a user's timeline, newest first.
+
+    Ordered on the timeline entry's columns (annotated as ``timeline_date``
+    and ``timeline_post``, see FeedPagination) rather than the post's, so
+    the page is read in timeline_user_date_idx order without a sort.
+    """
+    return (
+        Post.objects.filter(timeline_entries__user=user)
+        .annotate(timeline_date=F("timeline_entries__published_date"), timeline_post=F("timeline_entries__post"))
+        .order_by("-timeline_date", "-timeline_post")
+    )
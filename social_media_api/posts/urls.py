@@ -3,17 +3,29 @@ from django.contrib.auth import views as auth_views
 from . import views
 from .views import HomePageView
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, FeedView, LikePostView, UnlikePostView
+from .views import PostViewSet, CommentViewSet, FeedView, LikePostView, UnlikePostView, CommentListCreateAPI
+from .views import PostsByTagAPI, TagCloudView, TrendingTagsView
+from .views import feed_async, post_detail_async, BulkLikeView, ExportView
+from django.conf import settings
 
 router = DefaultRouter()
 router.register(r"posts", PostViewSet)
 router.register(r"comments", CommentViewSet)
 #app_name = "blog"
 
+# under ASGI the feed and post detail reads use the async ORM
+if settings.ASYNC_READ_VIEWS:
+    async_routes = [
+        path('feed/', feed_async, name='feed'),
+        path('posts/<int:pk>/', post_detail_async, name='post-detail'),
+    ]
+else:
+    async_routes = []
 
 urlpatterns = [
     #path('', views.HomePageView.as_view(), name='home'),
     path('', HomePageView.as_view(), name='home'),
+    *async_routes,  # listed first so they win over the router / FeedView
     # path('login/', CustomLoginView.as_view(), name='login'),
     # path('logout/', CustomLogoutView.as_view(next_page='home'), name='logout'),
     # path('register/', views.RegisterView.as_view(), name='register'),
@@ -23,6 +35,9 @@ urlpatterns = [
     path('feed/', FeedView.as_view(), name='feed'),
     path("<int:pk>/like/", LikePostView.as_view(), name="like-post"),
     path("<int:pk>/unlike/", UnlikePostView.as_view(), name="unlike-post"),
+    path("likes/bulk/", BulkLikeView.as_view(), name="bulk-like"),
+    path("posts/<int:pk>/comments/", CommentListCreateAPI.as_view(), name="post-comments"),
+    path("export/", ExportView.as_view(), name="export"),
     # path('posts/', PostListView.as_view(), name='post-list'),
     # path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     # path('post/new/', PostCreateView.as_view(), name='post-create'),
@@ -34,6 +49,9 @@ urlpatterns = [
     # path('comment/<int:pk>/update/', CommentUpdateView.as_view(), name='comment-update'),
     # path('comment/<int:pk>/delete/', CommentDeleteView.as_view(), name='comment-delete'),
     path('search/', views.search_posts, name='post-search'),
+    path('tags/cloud/', TagCloudView.as_view(), name='tag-cloud'),
+    path('tags/trending/', TrendingTagsView.as_view(), name='tag-trending'),
+    path('tags/<slug:tag_slug>/posts/', PostsByTagAPI.as_view(), name='posts-by-tag'),
     # path("tags/<slug:tag_slug>/", views.PostListView.as_view(), name='post-by-tag'),
     # path('tag/<slug:tag_slug>/', PostByTagListView.as_view(), name='post-by-tag'),
     # path('password_change/', auth_views.PasswordChangeView.as_view(), name='password_change'),
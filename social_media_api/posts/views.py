@@ -5,12 +5,26 @@ from .forms import PostForm, CommentForm
 from django.contrib import messages
 from django.urls import reverse_lazy
 from .models import Post, Comment, Like
-from rest_framework import viewsets, status, generics, permissions
-from .pagination import PostPagination
-from .serializers import PostSerializer, CommentSerializer
-from django.db.models import Q
+from rest_framework import viewsets, status, generics, permissions, filters
+from django_filters.rest_framework import DjangoFilterBackend
+from .pagination import PostCursorPagination, CommentCursorPagination, FeedPagination
+from .serializers import PostSerializer, CommentSerializer, BulkLikeSerializer
+from django.db import IntegrityError, connections, router, transaction
 from rest_framework.response import Response
-from notifications.models import Notification
+from rest_framework.views import APIView
+from notifications import dispatch
+from accounts import follow_graph
+from . import counters, export, search, tags, timeline
+from .filters import PostSearchFilter
+from .conditional import ConditionalGetMixin, detail_validators, not_modified
+from .fieldsets import SparseFieldsMixin, requested_fields, sparse_queryset
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from accounts.authentication import async_api_view
 
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
@@ -26,48 +40,60 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return obj.author == request.user
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all().order_by("-published_date")
+class PostViewSet(SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.for_api().order_by("-published_date")
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    pagination_class = PostPagination
+    pagination_class = PostCursorPagination  # ?page=N falls back to page numbers
 
         # Filtering
     filterset_fields = ["author__username"]  # e.g. ?author__username=alice
 
-    # Searching
+    # Searching: ranked token index, applied last so relevance order wins
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PostSearchFilter]
     search_fields = ["title", "content"]  # e.g. ?search=django
 
     # Ordering
     ordering_fields = ["published_date", "title"]  # e.g. ?ordering=title
     ordering = ["-published_date"]  # default ordering
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.with_liked_by(self.request.user) if self.wants("liked_by_me") else queryset
+
     def perform_create(self, serializer):
         # Automatically assign the logged-in user as author
+        # (posts/signals.py fans the new post out to followers' timelines)
         serializer.save(author=self.request.user)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all().order_by("-created_at")
+class CommentViewSet(SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Comment.objects.select_related("author", "post").prefetch_related("tags").order_by("-created_at")
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
-    pagination_class = PostPagination
+    pagination_class = CommentCursorPagination
+    version_fields = ("updated_at", "post__updated_at")  # post_title is in the payload
 
     def perform_create(self, serializer):
         # Automatically assign logged-in user as author
-        serializer.save(author=self.request.user)
+        comment = serializer.save(author=self.request.user)
+        dispatch.publish(recipient=comment.post.author_id, actor=self.request.user, verb="commented on your post", target=comment.post)
 
-class FeedView(generics.ListAPIView):
+class FeedView(SparseFieldsMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FeedPagination  # ?ranking=top orders by the precomputed score
 
     def get_queryset(self):
-        # Get users the current user follows
-        following_users = self.request.user.following.all()
-
-        posts = Post.objects.filter(author__in=following_users).order_by("-created_at")
-        # Get posts from followed users
-        return Post.objects.filter(author__in=following_users).order_by("-published_date")
+        # Users following nobody have an empty feed; skip the timeline query
+        if not follow_graph.following_ids(self.request.user.pk):
+            return Post.objects.none()
+        # Read the user's precomputed timeline instead of joining over follows
+        viewer = self.request.user if self.wants("liked_by_me") else None
+        posts = timeline.timeline_posts(self.request.user).for_api(viewer)
+        if self.request.query_params.get("ranking") == "top":
+            posts = posts.order_by(*FeedPagination.ranked_ordering)
+        return posts
     
 class LikePostView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -75,18 +101,14 @@ class LikePostView(generics.GenericAPIView):
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
 
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        # the like row and the like_count bump (posts/signals.py) commit together
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, post=post)
         if not created:
             return Response({"detail": "You already liked this post."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ create notification for post author
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked your post",
-                target=post
-            )
+        # ✅ notify the post author (written after the response, see notifications/dispatch.py)
+        dispatch.publish(recipient=post.author_id, actor=request.user, verb="liked your post", target=post)
 
         return Response({"status": "Post liked"}, status=status.HTTP_201_CREATED)
 
@@ -101,10 +123,94 @@ class UnlikePostView(generics.GenericAPIView):
         if not like:
             return Response({"detail": "You haven’t liked this post yet."}, status=status.HTTP_400_BAD_REQUEST)
 
-        like.delete()
+        with transaction.atomic():
+            like.delete()
         return Response({"status": "Post unliked"}, status=status.HTTP_200_OK)
         
 
+def _insert_likes(user, post_ids, liked, attempts=3):
+    """
+    Insert ``user``'s missing likes of ``post_ids`` (``liked`` are already
+    there); returns the post ids actually inserted.
+
+    No ignore_conflicts: a like committed concurrently fails the whole batch
+    (in a savepoint), and the batch is retried without it, so every id
+    returned really is a new row to count and notify about.
+    """
+    for attempt in range(attempts):
+        missing = sorted(set(post_ids) - liked)
+        try:
+            with transaction.atomic():
+                Like.objects.bulk_create([Like(user=user, post_id=post_id) for post_id in missing])
+            return missing
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+            liked = set(Like.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", flat=True))
+
+
+def _delete_likes(user, post_ids):
+    """
+    DELETE ``user``'s likes of ``post_ids`` in one statement (Like has no
+    dependents): no per-row post_delete. Returns the number of rows removed.
+    """
+    if not post_ids:
+        return 0
+    connection = connections[router.db_for_write(Like)]
+    table, quote = Like._meta.db_table, connection.ops.quote_name
+    user_column, post_column = Like._meta.get_field("user").column, Like._meta.get_field("post").column
+    placeholders = ", ".join(["%s"] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(table)} WHERE {quote(user_column)} = %s AND {quote(post_column)} IN ({placeholders})",
+            [user.pk, *post_ids],
+        )
+        return cursor.rowcount
+
+
+class BulkLikeView(generics.GenericAPIView):
+    """
+    Like or unlike up to 100 posts in one transaction:
+    {"action": "like" | "unlike", "post_ids": [...]}.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = BulkLikeSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action = serializer.validated_data["action"]
+        post_ids = set(serializer.validated_data["post_ids"])
+
+        with transaction.atomic():
+            authors = dict(Post.objects.filter(pk__in=post_ids).order_by().values_list("pk", "author_id"))
+            liked = set(
+                Like.objects.filter(user=request.user, post_id__in=authors).values_list("post_id", flat=True)
+            )
+            if action == "like":
+                # bulk_create sends no post_save, so the counters are bumped here in one UPDATE;
+                # only rows this request inserted are counted and notified about
+                changed = _insert_likes(request.user, set(authors), liked)
+                counters.increment(changed, "like_count", 1)
+                for post_id in changed:
+                    dispatch.publish(
+                        recipient=authors[post_id], actor=request.user, verb="liked your post", target=Post(pk=post_id)
+                    )
+            else:
+                changed = sorted(liked)
+                deleted = _delete_likes(request.user, changed)
+                if deleted == len(changed):
+                    counters.increment(changed, "like_count", -1)
+                else:  # a concurrent unlike got to some of them first: recount rather than double-decrement
+                    counters.reconcile(changed)
+
+        return Response({
+            "action": action,
+            "changed": changed,
+            "not_found": sorted(post_ids - set(authors)),
+        }, status=status.HTTP_200_OK)
+
+
 class HomePageView(TemplateView):
     template_name = 'base.html'
     
@@ -114,6 +220,14 @@ class PostListView(ListView):
     context_object_name = 'posts'
     paginate_by = 10
 
+    def get_queryset(self):
+        return Post.objects.select_related('author')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tags.prefetch_tag_names(context['posts'])  # one query for the page's tags
+        return context
+
 class PostDetailView(DetailView):
     model = Post
     template_name = 'posts/post_detail.html'
@@ -194,18 +308,25 @@ class CommentDetailView(LoginRequiredMixin, DetailView):
         return Comment.objects.filter(post__id=self.kwargs['pk']).order_by('-created_at')
 
 
-class CommentListCreateAPI(generics.ListCreateAPIView):
+class CommentListCreateAPI(SparseFieldsMixin, generics.ListCreateAPIView):
+    """Full comment thread of one post (PostSerializer only embeds a preview)."""
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
-        return Comment.objects.filter(post__id=self.kwargs["pk"])
+        return (
+            Comment.objects.filter(post__id=self.kwargs["pk"])
+            .select_related("author", "post")
+            .prefetch_related("tags")
+        )
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, post_id=self.kwargs["pk"])
+        comment = serializer.save(author=self.request.user, post_id=self.kwargs["pk"])
+        dispatch.publish(recipient=comment.post.author_id, actor=self.request.user, verb="commented on your post", target=comment.post)
 
 
-class CommentDetailAPI(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetailAPI(SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
@@ -214,11 +335,7 @@ def search_posts(request):
     query = request.GET.get("q")
     results = []
     if query:
-        results = Post.objects.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
+        results = search.search_posts(query, Post.objects.select_related("author"))
     return render(request, "posts/search_results.html", {"results": results, "query": query})
 
 
@@ -229,10 +346,127 @@ class PostByTagListView(ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        tag_slug = self.kwargs.get('tag_slug')
-        return Post.objects.filter(tags__slug=tag_slug).distinct().order_by('-published_date')
+        # TaggedItem subquery instead of taggit's join + DISTINCT
+        post_ids = tags.post_ids_for_tag(self.kwargs.get('tag_slug'))
+        return Post.objects.filter(pk__in=post_ids).select_related('author').order_by('-published_date')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['tag'] = self.kwargs.get('tag_slug')
+        tags.prefetch_tag_names(context['posts'])
         return context
-    
+
+
+class PostsByTagAPI(SparseFieldsMixin, generics.ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = PostCursorPagination
+
+    def get_queryset(self):
+        viewer = self.request.user if self.wants("liked_by_me") else None
+        return Post.objects.filter(pk__in=tags.post_ids_for_tag(self.kwargs["tag_slug"])).for_api(viewer)
+
+
+class ExportView(APIView):
+    """Staff-only NDJSON dump of posts and comments, streamed (see posts/export.py)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        types = [kind for kind in request.query_params.get("types", ",".join(export.EXPORTS)).split(",") if kind]
+        if not types or any(kind not in export.EXPORTS for kind in types):
+            return Response(
+                {"types": f"Choose from: {', '.join(export.EXPORTS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        # the body is read after the view returns: keep the alias routed for this request
+        chunks = export.logged_ndjson(types, using=router.db_for_read(Post))
+        filename, content_type = "export.ndjson", "application/x-ndjson"
+        if request.query_params.get("gzip") in ("1", "true"):
+            chunks = export.gzipped(chunks)
+            filename, content_type = "export.ndjson.gz", "application/gzip"
+        if isinstance(request._request, ASGIRequest):
+            chunks = export.aiter_chunks(chunks)  # a sync iterator would be buffered whole under ASGI
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+def _int_param(request, name, default, maximum):
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        value = default
+    return max(1, min(value, maximum))
+
+
+class TagCloudView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        limit = _int_param(request, "limit", 50, 200)
+        return Response(tags.tag_cloud(limit))
+
+
+class TrendingTagsView(APIView):
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        days = _int_param(request, "days", 7, 90)
+        limit = _int_param(request, "limit", 20, 100)
+        return Response(tags.trending_tags(days, limit))
+
+
+# ---------------------------------------------------------------------------
+# ASGI variants of the hot read endpoints (selected in posts/urls.py when
+# social_media_api/asgi.py is serving). Querysets load everything the
+# serializer reads up front, so serializing touches no database and is safe
+# on the event loop; a stray lazy query raises SynchronousOnlyOperation.
+# ---------------------------------------------------------------------------
+
+@async_api_view(auth_required=True)
+async def feed_async(request):
+    if not await sync_to_async(follow_graph.following_ids)(request.user.pk):
+        return JsonResponse({"next": None, "previous": None, "results": []})
+    paginator = FeedPagination()
+    serializer = PostSerializer(context={"request": request.api})  # validates ?fields= / ?omit=
+    viewer = request.user if "liked_by_me" in serializer.fields else None
+    posts = timeline.timeline_posts(request.user).for_api(viewer)
+    if request.GET.get("ranking") == "top":
+        posts = posts.order_by(*FeedPagination.ranked_ordering)
+    if requested_fields(request.api) is not None:
+        posts = sparse_queryset(posts, serializer, paginator.get_ordering(request.api, posts, None))
+    page = await paginator.apaginate_queryset(posts, request.api)
+    data = PostSerializer(page, many=True, context={"request": request.api}).data
+    return JsonResponse(paginator.get_paginated_data(data))
+
+
+_post_detail_sync = PostViewSet.as_view(
+    {"get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy"}
+)
+
+
+@csrf_exempt  # token-authenticated writes fall through to PostViewSet, as APIView.as_view() does
+async def post_detail_async(request, pk):
+    if request.method != "GET":
+        return await sync_to_async(_post_detail_sync)(request, pk=pk)
+    return await _post_detail_read(request, pk)
+
+
+@async_api_view(auth_required=False)
+async def _post_detail_read(request, pk):
+    version = await Post.objects.filter(pk=pk).values_list("updated_at", flat=True).afirst()
+    if version is None:
+        raise NotFound()
+    etag, last_modified = detail_validators(request, version)
+    cached = not_modified(request, etag, last_modified)
+    if cached is not None:
+        return cached
+
+    serializer = PostSerializer(context={"request": request.api})
+    posts = Post.objects.for_api(request.user if "liked_by_me" in serializer.fields else None)
+    if requested_fields(request.api) is not None:
+        posts = sparse_queryset(posts, serializer)
+    post = await posts.aget(pk=pk)
+    response = JsonResponse(PostSerializer(post, context={"request": request.api}).data)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_media_api.settings')
+# Serve the async views (see ASYNC_AUTH_VIEWS / ASYNC_READ_VIEWS in settings)
+os.environ.setdefault('SOCIAL_MEDIA_API_ASGI', '1')
 
 application = get_asgi_application()
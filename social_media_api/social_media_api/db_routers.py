@@ -0,0 +1,140 @@
+# social_media_api/db_routers.py
+"""
+Primary / read-replica routing.
+
+Writes always go to ``default`` (the primary). Reads go to one of the
+DATABASE_REPLICAS aliases only while ``ReplicaRoutingMiddleware`` handles a
+safe-method (GET/HEAD/OPTIONS) request under READ_REPLICA_PATH_PREFIXES;
+management commands, background threads and every other request keep
+reading from the primary.
+
+Read-your-writes: replicas lag behind the primary, so
+
+* once a request writes anything, its remaining reads use the primary;
+* a response to a write (unsafe method, or a GET that wrote) sets the
+  READ_REPLICA_PIN_COOKIE cookie for READ_YOUR_WRITES_SECONDS, and requests
+  carrying it read from the primary too. API clients that do not keep
+  cookies (most token-authenticated scripts and mobile HTTP stacks) get no
+  such pinning: a GET right after their own write may still see the
+  replica's older data.
+
+Reads that fill a cache (token snapshots, follow-graph sets, tag lookups)
+always use the primary explicitly (``.using(PRIMARY)``); stale replica data
+would otherwise be cached for far longer than the replica lag.
+
+The routing state lives in a context variable, so it follows the request
+into ``sync_to_async`` threads of the async views and never leaks into
+other requests.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+REPLICAS = list(getattr(settings, "DATABASE_REPLICAS", []))
+PATH_PREFIXES = tuple(getattr(settings, "READ_REPLICA_PATH_PREFIXES", ("/api/",)))
+PIN_COOKIE = getattr(settings, "READ_REPLICA_PIN_COOKIE", "read_primary")
+PIN_SECONDS = getattr(settings, "READ_YOUR_WRITES_SECONDS", 10)
+
+
+class RoutingState:
+    """Per-request routing decision; mutated when the request writes."""
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+_state = ContextVar("db_routing_state", default=None)
+
+
+def current_read_alias():
+    state = _state.get()
+    if state is None or state.wrote or state.replica is None:
+        return PRIMARY
+    if connections[PRIMARY].in_atomic_block:  # reads inside a transaction belong to it
+        return PRIMARY
+    return state.replica
+
+
+@contextmanager
+def _routing(replica):
+    token = _state.set(RoutingState(replica))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+def use_replica(alias=None):
+    """Read from ``alias`` (default: a random replica) inside the ``with`` block."""
+    return _routing(alias or (random.choice(REPLICAS) if REPLICAS else None))
+
+
+def use_primary():
+    return _routing(None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return current_read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {PRIMARY, *REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Decides, per request, whether its reads may go to a replica."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.routing(request) as state:
+            response = self.get_response(request)
+        return self.finish(request, state, response)
+
+    async def __acall__(self, request):
+        with self.routing(request) as state:
+            response = await self.get_response(request)
+        return self.finish(request, state, response)
+
+    def routing(self, request):
+        if REPLICAS and self.may_use_replica(request):
+            return use_replica()
+        return use_primary()
+
+    def may_use_replica(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and request.path.startswith(PATH_PREFIXES)
+            and PIN_COOKIE not in request.COOKIES
+        )
+
+    def finish(self, request, state, response):
+        if REPLICAS and (request.method not in SAFE_METHODS or state.wrote):
+            response.set_cookie(PIN_COOKIE, "1", max_age=PIN_SECONDS, httponly=True, samesite="Lax")
+        return response
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django_filters',
     'posts.apps.PostsConfig',  # Your posts app
     'rest_framework',  # Django REST Framework for API support
+    'rest_framework.authtoken',  # Token table used by TokenAuthentication
     'accounts.apps.AccountsConfig',  # Your accounts app
     'taggit',  # Django Taggit for tagging functionality
     'notifications.apps.NotificationsConfig',  # Your notifications app
@@ -54,7 +55,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "accounts.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -68,6 +69,74 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Materialized home timelines (posts/timeline.py)
+TIMELINE_MAX_LENGTH = 800  # entries kept per user by rebuild_timelines
+TIMELINE_BACKFILL = 50  # latest posts copied in when following someone
+
+# Cached follow-graph adjacency sets (accounts/follow_graph.py)
+FOLLOW_GRAPH_CACHE_TIMEOUT = 60 * 60
+
+# "Who to follow" candidates (accounts/suggestions.py, `manage.py rebuild_follow_suggestions`)
+FOLLOW_SUGGESTIONS_LIMIT = 20  # candidates stored per user, and the endpoint's maximum
+FOLLOW_SUGGESTIONS_BATCH_PAIRS = 2_000_000  # two-hop paths expanded per batch
+
+# Notification pipeline (notifications/dispatch.py). Switch to
+# "notifications.dispatch.OutboxBackend" + `manage.py process_notifications`
+# when more than one process serves the API.
+NOTIFICATION_BACKEND = "notifications.dispatch.BufferedBackend"
+NOTIFICATION_BATCH_SIZE = 500
+NOTIFICATION_STREAM_KEEPALIVE = 15  # seconds between SSE keepalives (and re-checks)
+NOTIFICATION_STREAM_MAX_SECONDS = 300  # clients reconnect with Last-Event-ID
+
+# Read-notification retention (notifications/retention.py, `manage.py prune_notifications`)
+NOTIFICATION_RETENTION_DAYS = 90
+NOTIFICATION_RETENTION_BATCH_SIZE = 1000  # rows per delete transaction
+NOTIFICATION_ARCHIVE = False  # True: move pruned rows to ArchivedNotification
+
+# Shared cache for all worker processes (token snapshots, follow graph, tag
+# lookups are invalidated in it on writes). Set CACHE_URL=redis://... in
+# production; without it every process has its own LocMem cache.
+CACHE_URL = os.environ.get("CACHE_URL")
+if CACHE_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+
+# Maximum ranked hits returned by post search (posts/search.py)
+SEARCH_RESULT_LIMIT = 200
+
+# Tag clouds / tag slug lookups (posts/tags.py)
+TAG_CACHE_TIMEOUT = 5 * 60
+
+# Ranked feed scores (posts/ranking.py, `manage.py update_post_scores`)
+POST_SCORE_DECAY_SECONDS = 12 * 60 * 60  # this much recency outweighs 10x engagement
+POST_SCORE_SETTLE_SECONDS = 30
+
+# NDJSON exports (posts/export.py, `manage.py export_posts`, /api/export/)
+EXPORT_BATCH_SIZE = 2000  # rows per keyset batch
+IMPORT_CHUNK_SIZE = 2000  # rows per import transaction (posts/importer.py, `manage.py import_posts`)
+
+# Cached token -> (user id, is_active) snapshots (accounts/authentication.py).
+# Logout / deactivation must reach every worker, so this stays off (0)
+# unless the cache is shared.
+AUTH_TOKEN_CACHE_TIMEOUT = 5 * 60 if CACHE_URL else 0
+
+# Bounded password-hashing pool for login / register (accounts/hashing.py)
+PASSWORD_HASHING_WORKERS = 4
+PASSWORD_HASHING_MAX_PENDING = 32  # running + queued; beyond this: 503 + Retry-After
+PASSWORD_HASHING_RETRY_AFTER = 1
+
+# Async view variants, used when served by social_media_api/asgi.py (it sets the flag)
+ASYNC_AUTH_VIEWS = os.environ.get("SOCIAL_MEDIA_API_ASGI") == "1"  # login / register
+ASYNC_READ_VIEWS = ASYNC_AUTH_VIEWS  # feed, post detail, notification list
+
+# Image derivatives (posts/images.py): rendered off the request thread
+IMAGE_VARIANTS = {"thumbnail": (150, 150), "medium": (800, 800)}
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANTS_IN_PROCESS = True  # False: leave it to `manage.py process_images`
+IMAGE_VARIANT_WORKERS = 2
+
+# Number of latest comments embedded in each serialized post
+POST_COMMENT_PREVIEW_SIZE = 3
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -76,6 +145,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'social_media_api.db_routers.ReplicaRoutingMiddleware',  # primary vs replica reads
 ]
 
 ROOT_URLCONF = 'social_media_api.urls'
@@ -120,6 +190,19 @@ DATABASES = {
     }
 }
 
+# Read replicas (social_media_api/db_routers.py): ";"-separated hosts, each a
+# copy of the primary kept in sync by SQL Server. Safe-method API requests
+# read from a replica; writes, and reads for READ_YOUR_WRITES_SECONDS after
+# a client's write, use "default". For a local run, point replica aliases at
+# other databases (e.g. two SQLite files) and list them in DATABASE_REPLICAS.
+for number, host in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_HOSTS", "").split(";")), 1):
+    DATABASES[f"replica{number}"] = {**DATABASES["default"], "HOST": host, "TEST": {"MIRROR": "default"}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["social_media_api.db_routers.PrimaryReplicaRouter"]
+READ_REPLICA_PATH_PREFIXES = ("/api/",)
+READ_YOUR_WRITES_SECONDS = 10
+
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = "home"
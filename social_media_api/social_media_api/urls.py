@@ -19,5 +19,7 @@ from django.urls import path, include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("api/", include('posts.urls'))  # Include the blog app's URLs
+    path("api/", include('posts.urls')),  # Include the blog app's URLs
+    path("api/accounts/", include('accounts.urls')),
+    path("api/notifications/", include('notifications.urls')),
 ]